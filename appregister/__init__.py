@@ -1,6 +1,10 @@
 # following PEP 386, versiontools will pick it up
 __version__ = (0, 4, 0, "dev", 0)
 
-from appregister.base import Registry, NamedRegistry, SortedRegistry
+from appregister.base import (Registry, NamedRegistry, SortedRegistry,
+    IndexedNamedRegistry, DependencyRegistry, DispatchRegistry,
+    freeze_registries)
 
-__all__ = ['__version__', 'Registry', 'NamedRegistry', 'SortedRegistry']
+__all__ = ['__version__', 'Registry', 'NamedRegistry', 'SortedRegistry',
+    'IndexedNamedRegistry', 'DependencyRegistry', 'DispatchRegistry',
+    'freeze_registries']
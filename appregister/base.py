@@ -1,15 +1,25 @@
-from collections import Mapping, Sized, Iterable
-
-try:
-    # Django versions >= 1.9
-    from django.utils.module_loading import import_module
-except ImportError:
-    # Django versions < 1.9
-    from django.utils.importlib import import_module
+import gc
+import heapq
+import sys
+import traceback
+import warnings
+import weakref
+from abc import ABCMeta
+from bisect import bisect_left
+from contextlib import contextmanager
+from difflib import get_close_matches
+from fnmatch import fnmatchcase
+from functools import wraps
+from timeit import default_timer
 
 from django.utils.module_loading import module_has_submodule
-from django.core.urlresolvers import get_callable
-from django.conf import settings
+
+from appregister.compat import (Iterable, Mapping, Sized, import_module,
+    get_callable, string_types, get_cache_token, compose_mro)
+from appregister.snapshot import (dotted_path, entry_path, entry_key,
+    entry_digest, import_path, content_hash, LazyClass)
+from appregister.discovery import DiscoveryReport
+from appregister.signals import registry_changed
 
 
 class AppRegisterException(Exception):
@@ -30,8 +40,145 @@ class AlreadyRegistered(AppRegisterException):
     """
 
 
+class CircularDependency(InvalidOperation):
+    """
+    Raised when registering a class with a ``DependencyRegistry`` would
+    create a cycle in the declared dependencies.
+    """
+
+
+class ImportBudgetExceeded(AppRegisterException):
+    """
+    Raised by ``autodiscover`` when importing the discover module from an app
+    takes longer, or imports more new modules, than the registry allows and
+    its ``budget_action`` is ``"raise"``.
+    """
+
+
+class ImportBudgetWarning(UserWarning):
+    """
+    Warned by ``autodiscover`` when importing the discover module from an app
+    takes longer, or imports more new modules, than the registry allows and
+    its ``budget_action`` is ``"warn"``.
+    """
+
+
+class InvalidSnapshot(AppRegisterException):
+    """
+    Raised when loading a snapshot that was taken from a different registry
+    or whose content hash doesn't match its entries.
+    """
+
+
+def _hashable(entry):
+    return tuple(entry) if isinstance(entry, list) else entry
+
+
+def _listed(entry):
+    return list(entry) if isinstance(entry, tuple) else entry
+
+
+def _matches(app, patterns):
+    for pattern in patterns:
+        if app == pattern or fnmatchcase(app, pattern):
+            return True
+    return False
+
+
+# Fingerprints are 256 bit integers, combined modulo 2 ** 256.
+FINGERPRINT_MASK = (1 << 256) - 1
+
+# The multiplier for the order dependent fingerprint of a SortedRegistry.
+FINGERPRINT_BASE = 1000003
+
+
+# How many of the packages that imported the most new modules, and how many
+# modules from each, are listed when an app goes over its import budget.
+BUDGET_PACKAGES = 5
+BUDGET_MODULES = 5
+
+
+#: Re-registration policies accepted by ``NamedRegistry.register``.
+ERROR = 'error'
+REPLACE = 'replace'
+IGNORE = 'ignore'
+POLICIES = (ERROR, REPLACE, IGNORE)
+
+
+def _writer(method):
+    """
+    Decorates a registry method that changes the registry, so that it is
+    made to the latest contents. Changes to a shared registry are made in
+    ``_writing``. Other registries only import any classes pending from a
+    snapshot first, without the cost of a context manager.
+    """
+    @wraps(method)
+    def writer(self, *args, **kwargs):
+        if self._shared is None:
+            if self._pending:
+                self.resolve()
+            return method(self, *args, **kwargs)
+        with self._writing():
+            return method(self, *args, **kwargs)
+    return writer
+
+
 class BaseRegistry(Sized, Iterable):
 
+    # Dotted paths loaded from a snapshot that haven't been imported yet.
+    _pending = None
+
+    # Every live registry, so that ``freeze_registries`` can find them. Keyed
+    # by id since a ``NamedRegistry`` is a Mapping and so isn't hashable.
+    _instances = weakref.WeakValueDictionary()
+
+    #: True once ``freeze`` has been called, until ``thaw`` is called.
+    frozen = False
+
+    # The ``SharedGeneration`` set by ``share``, its counter and the
+    # generation this registry was last synced with. Checking the counter
+    # is the only cost on read when nothing has changed.
+    _shared = None
+    _counter = None
+    _generation = 0
+
+    #: Incremented every time the registry changes, so it can be used in
+    #: cache keys for data derived from the registry.
+    version = 0
+
+    # How many ``batch`` blocks are currently open.
+    _batches = 0
+
+    #: The apps that ``autodiscover`` checks, as a list of app names or glob
+    #: patterns such as ``"myproject.plugins.*"``. None checks every app in
+    #: ``INSTALLED_APPS``. The ``APPREGISTER_DISCOVER_APPS`` setting takes
+    #: precedence, see ``get_discover_apps``.
+    discover_apps = None
+
+    #: App names or glob patterns that ``autodiscover`` never checks.
+    exclude_apps = ()
+
+    #: The most time in seconds that importing the discover module from any
+    #: one app should take during ``autodiscover``. None means no limit.
+    import_time_budget = None
+
+    #: The most new modules that importing the discover module from any one
+    #: app should import, including everything it imports indirectly. None
+    #: means no limit.
+    import_module_budget = None
+
+    #: What to do when an app goes over budget: ``"warn"`` warns with an
+    #: ``ImportBudgetWarning`` and ``"raise"`` raises ``ImportBudgetExceeded``.
+    budget_action = 'warn'
+
+    # The content fingerprint, see ``fingerprint``.
+    _fingerprint = 0
+
+    # The undo log used by ``checkpoint``, which is None when no checkpoint
+    # is open, and how many checkpoints are open.
+    _undo = None
+    _checkpoints = 0
+
     def __init__(self):
         """
         Initialise the datastore for the register and determine if the provided
@@ -39,6 +186,7 @@ class BaseRegistry(Sized, Iterable):
         """
 
         self.setup()
+        BaseRegistry._instances[id(self)] = self
 
         if not callable(self.base):
             self.base_str = self.base
@@ -46,9 +194,13 @@ class BaseRegistry(Sized, Iterable):
             self.get_bases()
 
     def __iter__(self):
+        if self._shared is not None or self._pending:
+            self._refresh()
         return iter(self._registry)
 
     def __len__(self):
+        if self._shared is not None or self._pending:
+            self._refresh()
         return len(self._registry)
 
     def get_bases(self):
@@ -68,26 +220,157 @@ class BaseRegistry(Sized, Iterable):
         of the registered subclases. The datastructure used should be defined
         in the subclasses ``setup`` method.
         """
+        if self._shared is not None or self._pending:
+            self._refresh()
         return self._registry
 
-    def autodiscover(self, module=None):
+    def autodiscover(self, module=None, fail_fast=True, apps=None):
         """
         Accepts either no arguements or the name of the module to check. It
         then looks at each of the ``INSTALLED_APPS`` for the given module
         name or with the same named as ``discovermodule`` to find any
         registered subclasses.
+
+        Only the apps returned by ``get_discover_apps`` are checked, unless a
+        list of ``apps`` is given.
+
+        By default an exception raised while importing the module from an app
+        stops autodiscovery. If ``fail_fast`` is False, the remaining apps
+        are still checked and the exceptions are recorded instead.
+
+        Returns an ``appregister.discovery.DiscoveryReport`` with the outcome
+        and timing for each app. Calling ``retry`` on the report checks the
+        failed apps again, without repeating the imports that succeeded. Any
+        classes registered by an app whose module then raised are removed
+        again, so the module can be imported cleanly by ``retry``.
+
+        If an ``import_time_budget`` or ``import_module_budget`` is set, the
+        modules newly imported for each app are recorded in the report and
+        checked with ``check_import_budget``.
         """
 
         if not module:
             module = self.discovermodule
 
+        if apps is None:
+            apps = self.get_discover_apps(module)
+
+        report = DiscoveryReport(self, module)
+
+        measure = (self.import_time_budget is not None or
+                   self.import_module_budget is not None)
+
+        with self.batch():
+            for app in apps:
+                found, modules = False, None
+                if measure:
+                    before = set(sys.modules)
+                start = default_timer()
+                try:
+                    with self._attempt():
+                        found = self.discover_app(app, module)
+                    duration = default_timer() - start
+                    if measure:
+                        modules = sorted(set(sys.modules) - before)
+                        self.check_import_budget(app, module, duration,
+                            modules)
+                except Exception as e:
+                    if fail_fast:
+                        raise
+                    report.add(app, found, default_timer() - start, e,
+                        traceback.format_exc(), modules)
+                else:
+                    report.add(app, found, duration, modules=modules)
+
+        return report
+
+    def check_import_budget(self, app, module, duration, modules):
+        """
+        Accepts the name of an ``app`` and discover ``module``, the
+        ``duration`` of the import in seconds and the list of ``modules`` it
+        newly imported. If the import went over ``import_time_budget`` or
+        ``import_module_budget``, the ``budget_action`` is taken. The message
+        names the new modules grouped by their top level package, largest
+        first, so that heavy dependencies are easy to spot. Only the first
+        few packages and modules are named.
+        """
+        problems = []
+        if (self.import_time_budget is not None and
+                duration > self.import_time_budget):
+            problems.append("took %.3fs (budget %.3fs)" % (
+                duration, self.import_time_budget))
+        if (self.import_module_budget is not None and
+                len(modules) > self.import_module_budget):
+            problems.append("imported %s new modules (budget %s)" % (
+                len(modules), self.import_module_budget))
+        if not problems:
+            return
+
+        packages = {}
+        for name in modules:
+            packages.setdefault(name.partition('.')[0], []).append(name)
+        largest = sorted(packages.items(),
+                         key=lambda item: (-len(item[1]), item[0]))
+
+        listed = []
+        for package, names in largest[:BUDGET_PACKAGES]:
+            shown = ', '.join(names[:BUDGET_MODULES])
+            if len(names) > BUDGET_MODULES:
+                shown += ' and %s more' % (len(names) - BUDGET_MODULES)
+            listed.append('%s (%s: %s)' % (package, len(names), shown))
+        if len(largest) > BUDGET_PACKAGES:
+            listed.append('%s more packages' % (
+                len(largest) - BUDGET_PACKAGES))
+
+        msg = "Importing '%s.%s' %s. New modules by package: %s" % (
+            app, module, ' and '.join(problems), '; '.join(listed) or 'none')
+
+        if self.budget_action == 'raise':
+            raise ImportBudgetExceeded(msg)
+        warnings.warn(msg, ImportBudgetWarning)
+
+    def get_discover_apps(self, module):
+        """
+        Accepts the name of the discover ``module`` and returns the list of
+        ``INSTALLED_APPS`` that ``autodiscover`` should check for it. If the
+        ``APPREGISTER_DISCOVER_APPS`` setting (a ``dict`` mapping discover
+        module names to lists of app names or glob patterns) has an entry for
+        the module, it is used. Otherwise the ``discover_apps`` attribute is
+        used. Apps matching ``exclude_apps`` are always left out::
+
+            APPREGISTER_DISCOVER_APPS = {
+                'questions': ['polls', 'surveys.*'],
+            }
+        """
+        # Imported here rather than with appregister, as django.conf imports
+        # much of Django.
+        from django.conf import settings
+
+        mapping = getattr(settings, 'APPREGISTER_DISCOVER_APPS', None) or {}
+        include = mapping.get(module, self.discover_apps)
+
+        apps = []
         for app in settings.INSTALLED_APPS:
-            try:
-                import_module(".%s" % module, app)
-            except ImportError:
-                if module_has_submodule(import_module(app), module):
-                    raise
+            if include is not None and not _matches(app, include):
+                continue
+            if _matches(app, self.exclude_apps):
                 continue
+            apps.append(app)
+        return apps
+
+    def discover_app(self, app, module):
+        """
+        Accepts the name of an ``app`` and a ``module`` and imports the module
+        from the app. Returns True if the module was imported and False if the
+        app doesn't have the module. Any other error is raised.
+        """
+        try:
+            import_module(".%s" % module, app)
+        except ImportError:
+            if module_has_submodule(import_module(app), module):
+                raise
+            return False
+        return True
 
     def is_valid(self, class_):
         """
@@ -104,6 +387,8 @@ class BaseRegistry(Sized, Iterable):
         By default it usess the ``in`` keyword to check if ``class`` is in
         ``self._registry``.
         """
+        if self._shared is not None or self._pending:
+            self._refresh()
         return class_ in self._registry
 
     def setup(self):
@@ -115,13 +400,424 @@ class BaseRegistry(Sized, Iterable):
         """
         self._registry = set()
 
+    @_writer
     def clear(self):
         """
         Accepts no arguements and resets the registry and removes any
         previously registered classes. By default this calls the ``setup``
         method to re-initialise the register.
         """
+        self._ensure_mutable()
+        if self._undo is not None:
+            self.record('reset', self.saved_entries())
+        self._pending = None
         self.setup()
+        self._fingerprint = 0
+        self.changed()
+
+    def freeze(self):
+        """
+        Accepts no arguements and moves the registered classes into a compact,
+        immutable datastructure (as defined by ``compact``). Once frozen,
+        changing the registry raises ``appregister.base.InvalidOperation``
+        until ``thaw`` is called. This is intended to be called once startup
+        has finished, see ``appregister.freeze_registries``.
+        """
+        if self._shared is not None or self._pending:
+            self._refresh()
+        self._registry = self.compact(self._registry)
+        self.frozen = True
+
+    def thaw(self):
+        """
+        Accepts no arguements and reverses ``freeze``, moving the registered
+        classes back into a datastructure that can be changed.
+        """
+        self._registry = self.expand(self._registry)
+        self.frozen = False
+
+    def compact(self, registry):
+        """
+        Accepts the datastructure created by ``setup`` and returns an
+        immutable copy of it for ``freeze``. By default the ``set`` becomes a
+        ``frozenset``.
+        """
+        return frozenset(registry)
+
+    def expand(self, registry):
+        """
+        Accepts the datastructure created by ``compact`` and returns a copy of
+        it that matches the datastructure created by ``setup``.
+        """
+        return set(registry)
+
+    def _ensure_mutable(self):
+        if self.frozen:
+            msg = "'%s' is frozen and can't be changed" % (
+                self.__class__.__name__)
+            raise InvalidOperation(msg)
+
+    def _ensure_shareable(self, *objects):
+        # Shared registries publish a snapshot after every change, so objects
+        # that can't be written as a dotted path are rejected before the
+        # registry is changed.
+        if self._shared is None:
+            return
+        for obj in objects:
+            try:
+                dotted_path(obj)
+            except ValueError as e:
+                raise InvalidOperation("%s, so it can't be added to a shared "
+                    "registry" % e)
+
+    def _refresh(self, resolve=True):
+        # Loads the snapshot published by another process if the shared
+        # generation has moved on, and imports the classes loaded from a
+        # snapshot unless ``resolve`` is False. Reads only call this when the
+        # registry is shared or has pending classes, so that other
+        # registries don't pay for a method call on every read.
+        if (self._shared is not None and
+                self._generation != self._counter.value):
+            self.sync()
+        if resolve and self._pending:
+            self.resolve()
+
+    @contextmanager
+    def _writing(self):
+        # Held while a shared registry is changed. The file lock is held
+        # from loading the latest snapshot until the change has been
+        # published, so no other process can change the registry in between
+        # and have its change overwritten.
+        with self._shared.lock():
+            self._refresh()
+            yield
+
+    def snapshot(self, with_hash=True):
+        """
+        Accepts an optional ``with_hash`` flag and returns a ``dict`` that
+        describes the registered classes by their dotted paths. The snapshot
+        only contains strings and lists so it can be stored as JSON and
+        passed to ``load_snapshot`` in another process.
+        """
+        entries = self.dump_entries()
+        snapshot = {
+            'registry': dotted_path(self.__class__),
+            'entries': entries,
+        }
+        if with_hash:
+            snapshot['hash'] = content_hash(entries)
+            snapshot['fingerprint'] = '%064x' % self._fingerprint
+        return snapshot
+
+    def fingerprint(self):
+        """
+        Accepts no arguements and returns a 32 byte fingerprint of the
+        registry's contents as a hex string. Registries with the same classes
+        (and names) registered have the same fingerprint in every process,
+        so comparing fingerprints is a cheap way to check that every node of
+        a deployment discovered the same classes. The fingerprint is updated
+        in constant time as classes are registered and unregistered, except
+        that unregistering from a ``SortedRegistry`` works it out again from
+        every entry, as the positions of the later classes change.
+        """
+        self._refresh(resolve=False)
+        return '%064x' % self._fingerprint
+
+    def diff(self, snapshot):
+        """
+        Accepts a snapshot (from ``snapshot``, usually taken on another node)
+        and returns a ``dict`` describing how this registry differs from it.
+        ``added`` lists the entries only in this registry, ``removed`` lists
+        the entries only in the snapshot and ``reordered`` is True if the
+        entries are the same but in a different order. If the fingerprints
+        match, the entries are not compared.
+        """
+        if snapshot.get('fingerprint') == self.fingerprint():
+            return {'added': [], 'removed': [], 'reordered': False}
+
+        local = [_hashable(entry) for entry in self.dump_entries()]
+        other = [_hashable(entry) for entry in snapshot['entries']]
+        local_set, other_set = set(local), set(other)
+        return {
+            'added': [_listed(e) for e in local if e not in other_set],
+            'removed': [_listed(e) for e in other if e not in local_set],
+            'reordered': local_set == other_set and local != other,
+        }
+
+    def digests(self):
+        """
+        Returns an iterable of the digest of every entry in the registry, see
+        ``appregister.snapshot.entry_digest``. This is used to rebuild the
+        fingerprint and should be implemented by registries that support it.
+        """
+        return ()
+
+    def add_digest(self, digest):
+        """
+        Accepts the digest of an entry that has been registered and adds it
+        to the fingerprint. By default the order of entries is ignored.
+        """
+        self._fingerprint = (self._fingerprint + digest) & FINGERPRINT_MASK
+
+    def remove_digest(self, digest):
+        """
+        Accepts the digest of an entry that has been unregistered and removes
+        it from the fingerprint.
+        """
+        self._fingerprint = (self._fingerprint - digest) & FINGERPRINT_MASK
+
+    def rebuild_fingerprint(self):
+        """
+        Accepts no arguements and works out the fingerprint again from every
+        entry in the registry.
+        """
+        self._fingerprint = 0
+        for digest in self.digests():
+            self.add_digest(digest)
+
+    @_writer
+    def load_snapshot(self, snapshot):
+        """
+        Accepts a snapshot created by ``snapshot`` and replaces the contents
+        of the registry with it. No ``INSTALLED_APPS`` are probed, and the
+        registered classes are only imported when they are first used.
+
+        The exception ``appregister.base.InvalidSnapshot`` is raised if the
+        snapshot was taken from a different registry class, or if it has a
+        content hash that doesn't match its entries.
+        """
+        if snapshot['registry'] != dotted_path(self.__class__):
+            msg = "Snapshot of '%s' can't be loaded into '%s'" % (
+                snapshot['registry'], self.__class__.__name__)
+            raise InvalidSnapshot(msg)
+
+        entries = snapshot['entries']
+        if 'hash' in snapshot and snapshot['hash'] != content_hash(entries):
+            raise InvalidSnapshot("Snapshot content hash does not match")
+
+        if self._undo is not None:
+            self.record('reset', self.saved_entries())
+        self._load(entries)
+        self.changed()
+
+    def _load(self, entries):
+        self._ensure_mutable()
+        self._pending = None
+        self.setup()
+        self.load_entries(entries)
+        self.rebuild_fingerprint()
+
+    def share(self, path):
+        """
+        Accepts the ``path`` of a file used to share this registry with other
+        processes, such as the other workers of a server. Changes made to the
+        registry in one process are published as a snapshot and a shared
+        generation counter is incremented. Every other process that shared
+        the registry with the same ``path`` notices the new generation the
+        next time it reads from the registry and loads the snapshot, see
+        ``sync``.
+
+        The first process to share a path publishes its registry, and later
+        ones load what was published. This should be called once startup has
+        finished, as each change writes a full snapshot. Changes hold a lock
+        on the file while they load the latest snapshot, change it and
+        publish it, so changes made by different processes are applied one
+        after the other rather than overwriting each other.
+        """
+        # Imported here rather than with appregister, as only shared
+        # registries need ctypes and mmap.
+        from appregister.sync import SharedGeneration
+
+        shared = SharedGeneration(path)
+        with shared.lock():
+            if shared.counter.value == 0:
+                # The snapshot is taken before the registry is marked as
+                # shared, so a class without a dotted path leaves it unshared.
+                generation = shared.publish(self.snapshot())
+                self._shared, self._counter = shared, shared.counter
+                self._generation = generation
+            else:
+                self._shared, self._counter = shared, shared.counter
+                self.sync()
+
+    def sync(self):
+        """
+        Accepts no arguements and loads the snapshot last published by any
+        process sharing this registry. This is called automatically when a
+        read finds that the shared generation has changed. A frozen registry
+        is left unchanged.
+        """
+        generation, snapshot = self._shared.read()
+        self._generation = generation
+        if snapshot is not None and not self.frozen:
+            self._load(snapshot['entries'])
+            self.version += 1
+            self.notify(publish=False)
+
+    def changed(self):
+        """
+        Called after the registry is changed by ``register``, ``unregister``,
+        ``clear`` or ``load_snapshot``. By default it increments ``version``
+        and calls ``notify``, unless a ``batch`` is open.
+        """
+        self.version += 1
+        if not self._batches:
+            self.notify()
+
+    def notify(self, publish=True):
+        """
+        Tell everything that depends on the registry that it has changed. By
+        default this publishes the registry if it has been shared (see
+        ``share``) and sends the ``appregister.signals.registry_changed``
+        signal with the current ``version``.
+        """
+        if publish and self._shared is not None:
+            self._generation = self._shared.publish(self.snapshot())
+        registry_changed.send(sender=self.__class__, registry=self,
+            version=self.version)
+
+    @contextmanager
+    def batch(self):
+        """
+        A context manager that holds back notifications for the changes made
+        inside it. When the outermost batch ends, ``notify`` is called once
+        if anything changed::
+
+            with registry.batch():
+                for class_ in classes:
+                    registry.register(class_)
+
+        ``autodiscover`` runs inside a batch, so discovering any number of
+        classes results in a single notification.
+        """
+        if self._shared is None:
+            with self._batching():
+                yield self
+            return
+
+        # The file lock is held for the whole batch, see ``_writing``.
+        with self._writing():
+            with self._batching():
+                yield self
+
+    @contextmanager
+    def _batching(self):
+        version = self.version
+        self._batches += 1
+        try:
+            yield
+        finally:
+            self._batches -= 1
+            if not self._batches and self.version != version:
+                self.notify()
+
+    @contextmanager
+    def checkpoint(self):
+        """
+        A context manager that undoes every change made to the registry
+        inside it when it ends, so tests can change a registry without
+        rebuilding it or running ``autodiscover`` again::
+
+            with registry.checkpoint():
+                registry.register(TestOnlyClass)
+
+        While a checkpoint is open ``register``, ``unregister``, ``clear`` and
+        ``load_snapshot`` record how to reverse each change, and the changes
+        are reversed in the opposite order through the same methods. So the
+        cost of the rollback depends on the number of changes rather than
+        the size of the registry. Checkpoints can be nested.
+        """
+        if self._undo is None:
+            self._undo = []
+        mark = len(self._undo)
+        self._checkpoints += 1
+        try:
+            yield self
+        finally:
+            self._checkpoints -= 1
+            self.rollback(mark)
+            if not self._checkpoints:
+                self._undo = None
+
+    @contextmanager
+    def _attempt(self):
+        """
+        Like ``checkpoint``, but the changes made inside it are only undone
+        if it raises. Otherwise they are kept, and left in the undo log of
+        any checkpoint that is already open.
+        """
+        if self._undo is None:
+            self._undo = []
+        mark = len(self._undo)
+        self._checkpoints += 1
+        try:
+            yield
+        except Exception:
+            self.rollback(mark)
+            raise
+        finally:
+            self._checkpoints -= 1
+            if not self._checkpoints:
+                self._undo = None
+
+    def rollback(self, mark):
+        """
+        Accepts a position in the undo log and reverses the changes recorded
+        after it, newest first, inside a ``batch``. This is called by
+        ``checkpoint`` when it ends.
+        """
+        log, self._undo = self._undo, None
+        try:
+            with self.batch():
+                while len(log) > mark:
+                    self.undo(log.pop())
+        finally:
+            self._undo = log
+
+    def record(self, *operation):
+        """
+        Adds ``operation``, a tuple naming a change and the values needed to
+        reverse it, to the undo log if a ``checkpoint`` is open.
+        """
+        if self._undo is not None:
+            self._undo.append(operation)
+
+    def undo(self, operation):
+        """
+        Accepts an operation recorded by ``record`` and reverses it. This
+        should be implemented by registries that support checkpoints.
+        """
+        raise NotImplementedError
+
+    def saved_entries(self):
+        """
+        Returns a list of the current entries that ``undo`` can register
+        again to reverse ``clear`` or ``load_snapshot``.
+        """
+        raise NotImplementedError
+
+    def dump_entries(self):
+        """
+        Returns a list describing the registered classes for ``snapshot``.
+        This should be implemented by registries that support snapshots.
+        """
+        raise NotImplementedError
+
+    def load_entries(self, entries):
+        """
+        Accepts the list created by ``dump_entries`` and loads it into the
+        (empty) registry. This should be implemented by registries that
+        support snapshots.
+        """
+        raise NotImplementedError
+
+    def resolve(self):
+        """
+        Accepts no arguements and imports any classes that were loaded from a
+        snapshot but haven't been used yet. This is called automatically, but
+        can be called after loading a snapshot to import everything upfront.
+        """
+        self._pending = None
 
     def __repr__(self):
         return '<%s: %s members>' % (self.__class__.__name__, len(self))
@@ -147,6 +843,7 @@ class Registry(BaseRegistry):
         """
         self._registry.remove(class_)
 
+    @_writer
     def register(self, class_):
         """
         Accepts ``class_``, a class object that must extend ``base``. The
@@ -167,31 +864,105 @@ class Registry(BaseRegistry):
 
         The exception ``appregister.base.InvalidOperation`` is raised if the
         class is not a valid addition to this register, as defined by the
-        ``is_valid`` method.
+        ``is_valid`` method, or if the registry is shared (see ``share``)
+        and the class can't be imported by a dotted path.
         """
 
+        self._ensure_mutable()
+
         if not self.is_valid(class_):
             msg = "Object '%s' is not a subclass of '%s'" % (class_.__name__,
                 self.base.__name__)
             raise InvalidOperation(msg)
 
+        self._ensure_shareable(class_)
+
         if self.is_registered(class_):
-            msg = "Object '%s' has already been registered" % class_.__name__
+            msg = "Object '%s' has already been registered" % (
+                class_.__name__)
             raise AlreadyRegistered(msg)
 
         self.add_class(class_)
+        self.add_digest(entry_digest(entry_key(class_)))
+        self.record('register', class_)
+        self.changed()
 
         # Return the original class to allow this method to be used as a
         # class based decorator.
         return class_
 
+    @_writer
     def unregister(self, class_):
         """
         Accepts ``class_``, a class object and removes it from the registry. If
         the class is not registered a ``KeyError`` is raised.
         """
 
+        self._ensure_mutable()
+
+        position = (self.position(class_) if self._undo is not None
+                    else None)
         self.remove_class(class_)
+        self.remove_digest(entry_digest(entry_key(class_)))
+        self.record('unregister', class_, position)
+        self.changed()
+
+    def position(self, class_):
+        """
+        Returns where ``class_`` is stored, so ``undo`` can put it back in the
+        same place. Classes in a ``set`` have no position, so this is None.
+        """
+        return None
+
+    def undo(self, operation):
+        action = operation[0]
+        if action == 'register':
+            self.unregister(operation[1])
+        elif action == 'unregister':
+            self.register(operation[1])
+        elif action == 'reset':
+            self.clear()
+            for class_ in operation[1]:
+                self.register(class_)
+
+    def saved_entries(self):
+        if self._pending:
+            self.resolve()
+        return list(self._registry)
+
+    def dump_entries(self):
+        return sorted(dotted_path(class_) for class_ in self.all())
+
+    def load_entries(self, entries):
+        self._pending = list(entries)
+
+    def resolve(self):
+        pending, self._pending = self._pending, None
+        if not pending:
+            return
+
+        resolved = 0
+        try:
+            for path in pending:
+                # Importing the class usually runs the module that registers
+                # it, so it is only added here if that didn't happen.
+                class_ = LazyClass(path).resolve()
+                if class_ not in self._registry:
+                    self.add_class(class_)
+                resolved += 1
+        finally:
+            # If an import fails, the paths that weren't imported stay
+            # pending, so the next read raises again rather than seeing only
+            # part of the registry.
+            if resolved < len(pending):
+                self._pending = pending[resolved:]
+            self.rebuild_fingerprint()
+
+    def digests(self):
+        for class_ in self._registry:
+            yield entry_digest(entry_key(class_))
+        for path in self._pending or ():
+            yield entry_digest(path)
 
 
 class NamedRegistry(BaseRegistry, Mapping):
@@ -203,10 +974,16 @@ class NamedRegistry(BaseRegistry, Mapping):
     implements the Mapping ABC from the collections module
     """
 
+    #: The default re-registration policy, used when ``register`` is called
+    #: for a name that is already taken. See ``register`` for the options.
+    policy = ERROR
+
     def setup(self):
         self._registry = dict()
+        self._lazy = False
 
-    def register(self, name, class_=None):
+    @_writer
+    def register(self, name, class_=None, policy=None):
         """
         Accepts a ``name`` and ``class_``, a class object that must extend
         ``base``. The class is added to the registry.::
@@ -221,47 +998,462 @@ class NamedRegistry(BaseRegistry, Mapping):
             class MyClass:
                 pass
 
-        The exception ``appregister.base.AlreadyRegistered`` is raised if the
-        class has already been registered, as defined by the ``is_registered``
-        method.
+        The optional ``policy`` (which defaults to the ``policy`` attribute)
+        decides what happens when ``name`` is already registered:
+
+        * ``appregister.base.ERROR`` raises
+          ``appregister.base.AlreadyRegistered``.
+        * ``appregister.base.REPLACE`` swaps the existing class for
+          ``class_``, which is useful when reloading code.
+        * ``appregister.base.IGNORE`` keeps the existing class.
 
         The exception ``appregister.base.InvalidOperation`` is raised if the
         class is not a valid addition to this register, as defined by the
-        ``is_valid`` method.
+        ``is_valid`` method, or if the registry is shared (see ``share``)
+        and the class can't be imported by a dotted path.
         """
 
-        if self.is_registered(name):
-            msg = "Object '%s' has already been registered" % class_.__name__
-            raise AlreadyRegistered(msg)
-
         # If only name is provided, return a callable that accepts only the
         # class instance, this adds support for decorator registration on named
         # registries.
-        if not class_:
+        if class_ is None:
             def inner(class_):
-                return self.register(name, class_)
+                return self.register(name, class_, policy)
             return inner
 
+        if policy is None:
+            policy = self.policy
+
+        if policy not in POLICIES:
+            raise ValueError("Unknown registration policy '%s'" % policy)
+
+        self._ensure_mutable()
+
         if not self.is_valid(class_):
             msg = "Object '%s' is not a subclass of '%s'" % (class_.__name__,
                 self.base.__name__)
             raise InvalidOperation(msg)
 
-        self._registry[name] = class_
+        self._ensure_shareable(class_)
+
+        if policy == REPLACE:
+            if name in self._registry:
+                existing = self._registry[name]
+                self.remove_digest(self._digest(name, existing))
+                self.record('replace', name, existing)
+            else:
+                self.record('register', name)
+            self.replace_class(name, class_)
+        elif self.add_class(name, class_):
+            self.record('register', name)
+        else:
+            existing = self._registry.get(name)
+            if (isinstance(existing, LazyClass) and
+                    existing.path == entry_key(class_)):
+                # The class is being registered by its module as it is
+                # imported to fill in a placeholder from a snapshot.
+                self.remove_digest(self._digest(name, existing))
+                self.replace_class(name, class_)
+            elif policy == ERROR:
+                msg = "Name '%s' has already been registered" % (name,)
+                raise AlreadyRegistered(msg)
+            else:
+                # The existing class is kept, so nothing has changed.
+                return class_
+        self.add_digest(self._digest(name, class_))
+        self.changed()
 
         # Return the original class to allow this method to be used as a
         # class based decorator.
         return class_
 
+    @_writer
     def unregister(self, name):
         """
         Accepts a key, and removes it from the registry. If the key is not
         registered a ``KeyError`` is raised.
         """
+        self._ensure_mutable()
+        class_ = self._registry[name]
+        self.remove_class(name)
+        self.remove_digest(self._digest(name, class_))
+        self.record('unregister', name, class_)
+        self.changed()
+
+    def undo(self, operation):
+        action = operation[0]
+        if action == 'register':
+            self.unregister(operation[1])
+        elif action in ('replace', 'unregister'):
+            self._restore(operation[1], operation[2])
+        elif action == 'reset':
+            self.clear()
+            for name, class_ in operation[1]:
+                self._restore(name, class_)
+
+    def _restore(self, name, class_):
+        if isinstance(class_, LazyClass):
+            # Placeholders from a snapshot can't be registered, so the class
+            # is imported, which may register it under ``name`` itself.
+            class_ = class_.resolve()
+        self.register(name, class_, policy=REPLACE)
+
+    def saved_entries(self):
+        return list(self._registry.items())
+
+    def digests(self):
+        for name, class_ in self._registry.items():
+            yield self._digest(name, class_)
+
+    def _digest(self, name, class_):
+        return entry_digest(entry_key(name), entry_key(class_))
+
+    def add_class(self, name, class_):
+        """
+        Adds ``class_`` under ``name`` unless the name is already taken, in a
+        single ``dict`` operation. Returns True if the class was added and
+        False otherwise. Override this when using custom datastructures.
+        """
+        size = len(self._registry)
+        self._registry.setdefault(name, class_)
+        return len(self._registry) != size
+
+    def replace_class(self, name, class_):
+        """
+        Adds ``class_`` under ``name``, replacing any class that is already
+        registered with that name. Override this when using custom
+        datastructures.
+        """
+        self._registry[name] = class_
+
+    def remove_class(self, name):
+        """
+        A simple method we can override when using custom datastructures
+        """
         del self._registry[name]
 
+    def all(self):
+        if self._shared is not None or self._pending:
+            self._refresh()
+        if self._lazy:
+            self.resolve()
+        return self._registry
+
+    def freeze(self):
+        if self._lazy:
+            self.resolve()
+        super(NamedRegistry, self).freeze()
+
+    def compact(self, registry):
+        # The dict is kept, as it is needed for constant time lookups.
+        return registry
+
+    def expand(self, registry):
+        return registry
+
+    def dump_entries(self):
+        return sorted([name, entry_path(class_)]
+                      for name, class_ in self._registry.items())
+
+    def load_entries(self, entries):
+        for name, path in entries:
+            self.replace_class(name, LazyClass(path))
+        self._lazy = True
+
+    def resolve(self):
+        for name, class_ in list(self._registry.items()):
+            if isinstance(class_, LazyClass):
+                self.resolve_name(name)
+        self._lazy = False
+
+    def resolve_name(self, name):
+        """
+        Accepts a registered ``name`` and returns its class, importing it
+        first if it is still a placeholder loaded from a snapshot.
+        """
+        class_ = self._registry[name]
+        if not isinstance(class_, LazyClass):
+            return class_
+
+        resolved = class_.resolve()
+        # Importing the class may have already registered it under this name.
+        if self._registry.get(name) is class_:
+            self.replace_class(name, resolved)
+        return resolved
+
     def __getitem__(self, key):
-        return self._registry[key]
+        if self._shared is not None or self._pending:
+            self._refresh()
+        class_ = self._registry[key]
+        if isinstance(class_, LazyClass):
+            return self.resolve_name(key)
+        return class_
+
+    def __contains__(self, key):
+        if self._shared is not None or self._pending:
+            self._refresh()
+        return key in self._registry
+
+
+class IndexedNamedRegistry(NamedRegistry):
+    """
+    A ``NamedRegistry`` that keeps a sorted index of the registered names,
+    allowing prefix, range and namespace queries without scanning every key.
+    Names must be strings, with ``separator`` used to split them into
+    hierarchical namespaces such as ``"export.csv"``.
+
+    New names are collected and only sorted into the index by the next
+    query, so registering many names in a row costs a single sort rather
+    than a list insertion (which is ``O(N)``) for each one. Unregistering a
+    name removes it from the index straight away, which is ``O(N)``.
+    """
+
+    separator = '.'
+
+    def setup(self):
+        """
+        Override the setup method so that the sorted index is created (and
+        reset by ``clear``) alongside the ``dict``.
+        """
+        super(IndexedNamedRegistry, self).setup()
+        self._index = list()
+        self._added = list()
+
+    def register(self, name, class_=None, policy=None):
+        """
+        Works like ``NamedRegistry.register``, but the exception
+        ``appregister.base.InvalidOperation`` is raised if ``name`` is not a
+        string, as the names must be sorted together in the index.
+        """
+        if not isinstance(name, string_types):
+            raise InvalidOperation("Name '%r' is not a string" % (name,))
+        return super(IndexedNamedRegistry, self).register(name, class_,
+            policy)
+
+    def add_class(self, name, class_):
+        added = super(IndexedNamedRegistry, self).add_class(name, class_)
+        if added:
+            self._added.append(name)
+        return added
+
+    def replace_class(self, name, class_):
+        if name not in self._registry:
+            self._added.append(name)
+        super(IndexedNamedRegistry, self).replace_class(name, class_)
+
+    def remove_class(self, name):
+        super(IndexedNamedRegistry, self).remove_class(name)
+        index = self._sorted_index()
+        del index[bisect_left(index, name)]
+
+    def freeze(self):
+        self._sorted_index()
+        super(IndexedNamedRegistry, self).freeze()
+
+    def _sorted_index(self):
+        # Sorts the names added since the index was last used into it and
+        # returns the index. The index is already sorted, so the sort only
+        # has to order the new names and merge them in.
+        if self._added:
+            self._index.extend(self._added)
+            self._index.sort()
+            self._added = list()
+        return self._index
+
+    def range(self, start=None, stop=None):
+        """
+        Accepts an optional ``start`` and ``stop`` name and returns a sorted
+        list of the registered names where ``start <= name < stop``. Either
+        bound can be omitted to leave that end of the range open.
+        """
+        if self._shared is not None or self._pending:
+            self._refresh()
+        index = self._sorted_index()
+        lo = 0 if start is None else bisect_left(index, start)
+        hi = len(index)
+        if stop is not None:
+            hi = bisect_left(index, stop, lo)
+        return index[lo:hi]
+
+    def startswith(self, prefix):
+        """
+        Accepts a ``prefix`` and returns a sorted list of the registered names
+        that start with it.
+        """
+        if self._shared is not None or self._pending:
+            self._refresh()
+        index = self._sorted_index()
+        if not prefix:
+            return list(index)
+
+        lo = bisect_left(index, prefix)
+        # The first string that sorts after every name starting with
+        # ``prefix`` is the prefix with its last character incremented.
+        last = ord(prefix[-1])
+        if last >= 0x10ffff:
+            hi = lo
+            while hi < len(index) and index[hi].startswith(prefix):
+                hi += 1
+        else:
+            stop = prefix[:-1] + chr(last + 1)
+            hi = bisect_left(index, stop, lo)
+        return index[lo:hi]
+
+    def subtree(self, namespace):
+        """
+        Accepts a ``namespace`` and returns a sorted list containing the
+        namespace itself (if it is registered) and every name nested below
+        it. For example ``subtree("export")`` matches ``"export"`` and
+        ``"export.csv"`` but not ``"exporter"``.
+        """
+        names = self.startswith(namespace + self.separator)
+        if namespace in self._registry:
+            names.insert(0, namespace)
+        return names
+
+    def closest(self, name, n=3, cutoff=0.6):
+        """
+        Accepts a ``name`` that may not be registered and returns up to ``n``
+        registered names that closely match it, best match first. Candidates
+        are taken from the same namespace as ``name`` where possible, so the
+        cost depends on the size of that namespace rather than the registry.
+        """
+        if self._shared is not None or self._pending:
+            self._refresh()
+        namespace = name.rpartition(self.separator)[0]
+        if namespace:
+            candidates = self.subtree(namespace)
+            matches = get_close_matches(name, candidates, n, cutoff)
+            if matches:
+                return matches
+        return get_close_matches(name, self._sorted_index(), n, cutoff)
+
+
+class DispatchRegistry(NamedRegistry):
+    """
+    A ``NamedRegistry`` where the names are types, used to find the handler
+    registered for an object's type. Like ``functools.singledispatch``, the
+    handler for the closest type in the method resolution order is used, and
+    the result is cached for each type so that repeated lookups are a single
+    ``dict`` lookup. The cache is cleared whenever the registry changes.
+
+    Handlers can be registered for abstract base classes, such as
+    ``collections.abc.Sequence``, on Python 3.4 and later. They are placed in
+    the method resolution order of the types that implement them in the same
+    way as ``functools.singledispatch`` places them. On older versions only
+    the types in ``__mro__`` are checked.
+    """
+
+    def setup(self):
+        super(DispatchRegistry, self).setup()
+        self._cache = weakref.WeakKeyDictionary()
+        # Whether a handler is registered for an abstract base class, and
+        # the ``abc`` cache token the cache was last checked against.
+        self._abcs = False
+        self._cache_token = None
+
+    def register(self, type_, class_=None, policy=None):
+        """
+        Accepts a type and a handler class that must extend ``base``, and
+        works like ``NamedRegistry.register`` including as a decorator::
+
+            @handlers.register(int)
+            class IntHandler(Handler):
+                pass
+
+        The exception ``appregister.base.InvalidOperation`` is raised if
+        ``type_`` is not a type.
+        """
+        if not isinstance(type_, type):
+            raise InvalidOperation("Object '%s' is not a type" % (type_,))
+        self._ensure_shareable(type_)
+        return super(DispatchRegistry, self).register(type_, class_, policy)
+
+    def add_class(self, type_, class_):
+        added = super(DispatchRegistry, self).add_class(type_, class_)
+        self._changed_type(type_)
+        return added
+
+    def replace_class(self, type_, class_):
+        super(DispatchRegistry, self).replace_class(type_, class_)
+        self._changed_type(type_)
+
+    def remove_class(self, type_):
+        super(DispatchRegistry, self).remove_class(type_)
+        self._changed_type(type_)
+
+    def _changed_type(self, type_):
+        # Called after the registry is changed rather than before, so that a
+        # ``dispatch`` in between can't cache the old result.
+        if isinstance(type_, ABCMeta):
+            self._abcs = True
+        self._cache.clear()
+
+    def dispatch(self, cls):
+        """
+        Accepts a type and returns the handler registered for it, or for the
+        closest of its bases in the method resolution order. A ``KeyError``
+        is raised if there is no handler for the type or any of its bases,
+        and a ``RuntimeError`` if it implements two abstract base classes
+        with handlers and neither is closer.
+        """
+        if self._shared is not None or self._pending:
+            self._refresh()
+        if self._abcs and self._cache_token != get_cache_token():
+            # A class has been registered with an abstract base class, which
+            # may change the handler for it.
+            self._cache.clear()
+            self._cache_token = get_cache_token()
+
+        try:
+            handler = self._cache[cls]
+        except KeyError:
+            handler = self._cache[cls] = self._find(cls)
+
+        if handler is None:
+            raise KeyError(cls)
+        return handler
+
+    def handler_for(self, obj):
+        """
+        Accepts any object and returns the handler for its type, see
+        ``dispatch``.
+        """
+        return self.dispatch(type(obj))
+
+    def dump_entries(self):
+        return sorted([dotted_path(type_), entry_path(class_)]
+                      for type_, class_ in self._registry.items())
+
+    def load_entries(self, entries):
+        super(DispatchRegistry, self).load_entries(
+            [import_path(type_), path] for type_, path in entries)
+
+    def _find(self, cls):
+        if self._abcs:
+            mro = compose_mro(cls, list(self._registry))
+        else:
+            mro = cls.__mro__
+
+        # As in ``functools.singledispatch``, an abstract base class that
+        # comes straight after the match and isn't one of its bases is just
+        # as close, so the choice is ambiguous.
+        match = None
+        for type_ in mro:
+            if match is not None:
+                if (type_ in self._registry and type_ not in cls.__mro__ and
+                        match not in cls.__mro__ and
+                        not issubclass(match, type_)):
+                    msg = "Ambiguous dispatch for '%s': '%s' or '%s'" % (
+                        cls.__name__, match.__name__, type_.__name__)
+                    raise RuntimeError(msg)
+                break
+            if type_ in self._registry:
+                match = type_
+
+        if match is None:
+            return None
+        return self[match]
 
 
 class SortedRegistry(Registry):
@@ -269,6 +1461,10 @@ class SortedRegistry(Registry):
     Allows for a sorted registry by using a list instead of a set().
     """
 
+    # The order of the entries loaded from a snapshot, kept until they have
+    # all been imported.
+    _loaded = None
+
     def setup(self):
         """
         Override the setup method so that we can use a ``list()`` instead of
@@ -276,9 +1472,223 @@ class SortedRegistry(Registry):
         """
         self._registry = list()
 
+    def dump_entries(self):
+        return [dotted_path(class_) for class_ in self.all()]
+
+    def load_entries(self, entries):
+        super(SortedRegistry, self).load_entries(entries)
+        self._loaded = list(entries)
+
+    def compact(self, registry):
+        return tuple(registry)
+
+    def expand(self, registry):
+        return list(registry)
+
+    def add_digest(self, digest):
+        """
+        The fingerprint of a ``SortedRegistry`` depends on the order of the
+        classes, so each digest is appended to it like a polynomial hash.
+        """
+        self._fingerprint = ((self._fingerprint * FINGERPRINT_BASE + digest) &
+                             FINGERPRINT_MASK)
+
+    def remove_digest(self, digest):
+        """
+        Removing a class can change the position of the classes after it, so
+        the fingerprint is rebuilt, which takes time proportional to the
+        number of registered classes.
+        """
+        self.rebuild_fingerprint()
+
+    def resolve(self):
+        if not self._pending:
+            return
+        super(SortedRegistry, self).resolve()
+
+        # Modules may register their classes in a different order as they
+        # are imported, so restore the order recorded in the snapshot. It is
+        # kept until now in case an earlier import failed part way through.
+        order = dict((path, i) for i, path in enumerate(self._loaded))
+        self._loaded = None
+
+        def position(class_):
+            try:
+                return order.get(dotted_path(class_), len(order))
+            except ValueError:
+                return len(order)
+
+        self._registry.sort(key=position)
+        self.rebuild_fingerprint()
+
+    def position(self, class_):
+        return self._registry.index(class_)
+
+    def undo(self, operation):
+        super(SortedRegistry, self).undo(operation)
+        if operation[0] == 'unregister':
+            # ``register`` appends the class, so move it back to where it was.
+            self._registry.insert(operation[2], self._registry.pop())
+            self.rebuild_fingerprint()
+
     def add_class(self, class_):
         """
         Since we are using a ``list`` instead of a ``set``, we need to
         override this method to add ``class_`` to our list.
         """
         self._registry.append(class_)
+
+
+class DependencyRegistry(SortedRegistry):
+    """
+    A ``SortedRegistry`` where each class can declare the classes it must come
+    after, with an attribute such as ``after = ['myapp.plugins.Other']``.
+    The classes can be listed as class objects or dotted paths, and classes
+    that aren't registered are ignored. A dotted path matches every
+    registered class with that path. Iterating over the registry, or
+    calling ``all``, returns the classes in dependency order with ties kept
+    in the order they were registered. This order is cached until a class is
+    registered or unregistered.
+    """
+
+    #: The name of the class attribute that lists the classes a registered
+    #: class must come after.
+    dependency_attribute = 'after'
+
+    def setup(self):
+        super(DependencyRegistry, self).setup()
+        # The dependencies of each registered class, the classes that list
+        # each class or dotted path as a dependency, and the registered
+        # classes with each dotted path. Classes are keyed by the class
+        # itself, as different classes can share a dotted path.
+        self._nodes = dict()
+        self._dependents = dict()
+        self._paths = dict()
+        self._order = None
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def all(self):
+        """
+        Returns a list of the registered classes in dependency order. The list
+        is cached and only worked out again after the registry changes.
+        """
+        if self._shared is not None or self._pending:
+            self._refresh()
+        if self._order is None:
+            self._order = self.sort()
+        return self._order
+
+    def get_dependencies(self, class_):
+        """
+        Accepts a class and returns the set of classes and dotted paths it
+        declares that it must come after.
+        """
+        return set(getattr(class_, self.dependency_attribute, None) or ())
+
+    def add_class(self, class_):
+        """
+        Adds ``class_`` to the dependency graph, raising
+        ``appregister.base.CircularDependency`` if it would create a cycle.
+        """
+        dependencies = self.get_dependencies(class_)
+
+        # A cycle exists if anything that must come after the new class can
+        # already reach something that it must come after.
+        seen = set()
+        stack = [class_]
+        while stack:
+            current = stack.pop()
+            if current in dependencies or entry_key(current) in dependencies:
+                msg = "Registering '%s' would create a circular dependency" % (
+                    class_.__name__)
+                raise CircularDependency(msg)
+            for dependent in self._dependents_of(current):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+
+        super(DependencyRegistry, self).add_class(class_)
+        self._nodes[class_] = dependencies
+        for dependency in dependencies:
+            self._dependents.setdefault(dependency, set()).add(class_)
+        self._paths.setdefault(entry_key(class_), []).append(class_)
+        self._order = None
+
+    def remove_class(self, class_):
+        super(DependencyRegistry, self).remove_class(class_)
+        for dependency in self._nodes.pop(class_):
+            self._dependents[dependency].discard(class_)
+        path = entry_key(class_)
+        self._paths[path].remove(class_)
+        if not self._paths[path]:
+            del self._paths[path]
+        self._order = None
+
+    def resolve(self):
+        super(DependencyRegistry, self).resolve()
+        self._order = None
+
+    def sort(self):
+        """
+        Returns a new list of the registered classes in dependency order.
+        This is called by ``all`` when the cached order is out of date.
+        """
+        position = dict((class_, i) for i, class_ in enumerate(self._registry))
+        waiting = dict((class_, len(self._registered(dependencies)))
+                       for class_, dependencies in self._nodes.items())
+
+        ready = [(position[class_], class_)
+                 for class_, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+
+        order = []
+        while ready:
+            _, class_ = heapq.heappop(ready)
+            order.append(class_)
+            for dependent in self._dependents_of(class_):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (position[dependent], dependent))
+        return order
+
+    def _registered(self, dependencies):
+        # The registered classes matching a set of classes and dotted paths.
+        # Dotted paths match every registered class with that path.
+        classes = set()
+        for dependency in dependencies:
+            if isinstance(dependency, string_types):
+                classes.update(self._paths.get(dependency, ()))
+            elif dependency in self._nodes:
+                classes.add(dependency)
+        return classes
+
+    def _dependents_of(self, class_):
+        # The registered classes that list ``class_``, or its dotted path, as
+        # a dependency.
+        return (self._dependents.get(class_, set()) |
+                self._dependents.get(entry_key(class_), set()))
+
+
+def freeze_registries(collect=True):
+    """
+    Freeze every registry that has been created, see ``BaseRegistry.freeze``.
+    This is intended to be called once autodiscovery has finished, before a
+    server such as gunicorn forks its workers.
+
+    If ``collect`` is True (the default) the garbage collector is run and then,
+    on Python versions that support it, ``gc.freeze`` is called. This moves
+    every object that is still alive, including the registered classes, out of
+    the collector's reach. The collector then no longer writes to those objects
+    in the workers, so the memory pages they use can stay shared between the
+    forked processes.
+    """
+    for registry in list(BaseRegistry._instances.values()):
+        if not registry.frozen:
+            registry.freeze()
+
+    if collect:
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
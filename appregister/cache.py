@@ -0,0 +1,58 @@
+"""
+Memoize data derived from a registry, such as form choices or schemas, in the
+Django cache framework so that it is only worked out once for each version of
+the registry's contents, by whichever process gets there first.
+"""
+
+import hashlib
+from functools import wraps
+
+from appregister.compat import get_cache
+
+# Stored in place of None, so a cached None can be told apart from a miss.
+NONE = '__appregister_none__'
+
+
+def cached(registry, timeout=None, cache='default', key_prefix='appregister'):
+    """
+    A decorator that stores the result of a function in the Django cache
+    named ``cache``. The cache key is made from the function's dotted path,
+    its arguments and the ``fingerprint`` of ``registry``, so the result is
+    worked out again when the registry's contents change. Processes with the
+    same classes registered share the cached result::
+
+        @cached(questions, timeout=3600)
+        def question_choices():
+            return [(q.__name__, q.label) for q in questions]
+
+    The arguments must have a ``repr`` that identifies them, such as strings
+    and numbers. ``timeout`` is passed to the cache if it is given, otherwise
+    the cache's default timeout is used.
+    """
+    def decorator(func):
+        name = '%s.%s' % (func.__module__,
+                          getattr(func, '__qualname__', func.__name__))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = repr((args, sorted(kwargs.items())))
+            key = '%s:%s:%s:%s' % (key_prefix, registry.fingerprint(),
+                hashlib.sha1(name.encode('utf-8')).hexdigest(),
+                hashlib.sha1(arguments.encode('utf-8')).hexdigest())
+
+            backend = get_cache(cache)
+            value = backend.get(key)
+            if value is None:
+                value = func(*args, **kwargs)
+                stored = NONE if value is None else value
+                if timeout is None:
+                    backend.set(key, stored)
+                else:
+                    backend.set(key, stored, timeout)
+            elif isinstance(value, str) and value == NONE:
+                value = None
+            return value
+
+        return wrapper
+
+    return decorator
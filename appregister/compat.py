@@ -0,0 +1,73 @@
+"""
+Imports that have moved between the versions of Python and Django that
+appregister supports. Each one is picked once, by version, rather than by
+trying the old location first and catching the ``ImportError``.
+"""
+
+import sys
+
+import django
+
+if sys.version_info >= (3, 3):
+    from collections.abc import Iterable, Mapping, Sized
+else:
+    from collections import Iterable, Mapping, Sized
+
+if sys.version_info >= (3,):
+    string_types = (str,)
+else:
+    string_types = (basestring,)  # noqa
+
+if sys.version_info >= (3, 4):
+    from abc import get_cache_token
+    # Used by ``functools.singledispatch`` to place abstract base classes in
+    # the method resolution order of the classes that implement them.
+    from functools import _compose_mro as compose_mro
+else:
+    def get_cache_token():
+        return None
+
+    def compose_mro(cls, types):
+        return cls.__mro__
+
+if sys.version_info >= (2, 7):
+    from importlib import import_module
+else:
+    from django.utils.importlib import import_module
+
+
+def get_cache(alias):
+    """
+    Returns the Django cache backend configured as ``alias``. The cache is
+    looked up by the Django version, and ``django.core.cache`` is only
+    imported when this is first called, as it reads the settings.
+    """
+    if django.VERSION >= (1, 7):
+        from django.core.cache import caches
+        return caches[alias]
+    from django.core.cache import get_cache as _get_cache
+    return _get_cache(alias)
+
+
+# Django's ``get_callable``, imported by the first call to ``get_callable``.
+_get_callable = None
+
+
+def get_callable(lookup_view):
+    """
+    Django's ``get_callable``, which imports a function or class from its
+    dotted path. ``django.urls`` imports much of the rest of Django (the HTTP,
+    forms and model layers), so it is only imported the first time this is
+    called, when a registry that uses ``base_str`` is created.
+    """
+    global _get_callable
+    if _get_callable is None:
+        if django.VERSION >= (1, 10):
+            from django.urls import get_callable as _get_callable
+        else:
+            from django.core.urlresolvers import get_callable as _get_callable
+    return _get_callable(lookup_view)
+
+
+__all__ = ['Iterable', 'Mapping', 'Sized', 'string_types', 'get_cache_token',
+    'compose_mro', 'import_module', 'get_cache', 'get_callable']
@@ -0,0 +1,84 @@
+"""
+The results of running ``autodiscover`` on a registry.
+"""
+
+
+class AppResult(object):
+    """
+    The outcome of looking for the discover module in a single app. ``found``
+    is True if the app has the module, ``duration`` is the time in seconds
+    that was spent on the app, and ``error`` and ``traceback`` are set if
+    importing the module raised an exception. ``modules`` lists the modules
+    that were newly imported, if the registry has an import budget.
+    """
+
+    __slots__ = ('app', 'found', 'duration', 'error', 'traceback', 'modules')
+
+    def __init__(self, app, found, duration, error=None, traceback=None,
+                 modules=None):
+        self.app = app
+        self.found = found
+        self.duration = duration
+        self.error = error
+        self.traceback = traceback
+        self.modules = modules
+
+    def __repr__(self):
+        if self.error is not None:
+            state = 'failed'
+        else:
+            state = 'found' if self.found else 'missing'
+        return '<AppResult: %s %s %.4fs>' % (self.app, state, self.duration)
+
+
+class DiscoveryReport(object):
+    """
+    Returned by ``BaseRegistry.autodiscover``, with an ``AppResult`` in
+    ``results`` for each app that was checked.
+    """
+
+    def __init__(self, registry, module):
+        self.registry = registry
+        self.module = module
+        self.results = []
+
+    def add(self, app, found, duration, error=None, traceback=None,
+            modules=None):
+        result = AppResult(app, found, duration, error, traceback, modules)
+        self.results.append(result)
+        return result
+
+    @property
+    def discovered(self):
+        """
+        A list of the apps where the discover module was imported.
+        """
+        return [r.app for r in self.results if r.found and r.error is None]
+
+    @property
+    def failed(self):
+        """
+        A ``dict`` mapping each app where importing the discover module
+        raised an exception to that exception.
+        """
+        return dict((r.app, r.error) for r in self.results
+                    if r.error is not None)
+
+    @property
+    def duration(self):
+        """
+        The total time in seconds spent on all of the apps.
+        """
+        return sum(r.duration for r in self.results)
+
+    def retry(self):
+        """
+        Run ``autodiscover`` again for the apps that failed only, collecting
+        errors rather than raising them. Returns a new report.
+        """
+        return self.registry.autodiscover(self.module, fail_fast=False,
+            apps=[r.app for r in self.results if r.error is not None])
+
+    def __repr__(self):
+        return '<DiscoveryReport: %s, %s discovered, %s failed>' % (
+            self.module, len(self.discovered), len(self.failed))
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after a registry changes, with the registry class as the sender and the
+# arguments ``registry`` and ``version``. Changes made inside
+# ``BaseRegistry.batch`` are sent as a single signal when the batch ends.
+registry_changed = Signal()
@@ -0,0 +1,109 @@
+"""
+Helpers for exporting the contents of a registry as a plain, JSON serialisable
+snapshot and loading it again in another process without autodiscovery.
+"""
+
+import hashlib
+import json
+
+from appregister.compat import import_module
+
+
+def dotted_path(obj):
+    """
+    Accepts a class (or other importable object) and returns the dotted path
+    that can be used to import it again, such as ``"myapp.plugins.MyPlugin"``.
+    A ``ValueError`` is raised for objects that can't be imported by path,
+    such as classes defined inside a function.
+    """
+    name = getattr(obj, '__qualname__', obj.__name__)
+    if '<' in name:
+        raise ValueError("Object '%s' can't be imported by a dotted path"
+            % obj.__name__)
+    return '%s.%s' % (obj.__module__, name)
+
+
+def entry_path(class_):
+    """
+    Accepts a registered class, or a ``LazyClass`` placeholder, and returns
+    its dotted path without importing anything.
+    """
+    if isinstance(class_, LazyClass):
+        return class_.path
+    return dotted_path(class_)
+
+
+def import_path(path):
+    """
+    Accepts a dotted path created by ``dotted_path`` and returns the object it
+    points to. The longest importable module prefix is imported and the rest
+    of the path is looked up as attributes, so nested classes are supported.
+    """
+    parts = path.split('.')
+    for i in range(len(parts) - 1, 0, -1):
+        try:
+            obj = import_module('.'.join(parts[:i]))
+        except ImportError:
+            if i == 1:
+                raise
+            continue
+        for attr in parts[i:]:
+            obj = getattr(obj, attr)
+        return obj
+    raise ImportError("'%s' is not a dotted path" % path)
+
+
+def entry_key(obj):
+    """
+    Accepts a registered class, a ``LazyClass`` placeholder or a name and
+    returns a string that identifies it in every process. This is the dotted
+    path for classes, but unlike ``dotted_path`` it never raises, so classes
+    defined inside a function are identified by their ``<locals>`` path.
+    """
+    if isinstance(obj, LazyClass):
+        return obj.path
+    if isinstance(obj, str):
+        return obj
+    if hasattr(obj, '__module__') and hasattr(obj, '__name__'):
+        return '%s.%s' % (obj.__module__,
+                          getattr(obj, '__qualname__', obj.__name__))
+    return repr(obj)
+
+
+def entry_digest(*keys):
+    """
+    Accepts the keys for an entry (see ``entry_key``) and returns a 256 bit
+    integer digest of them.
+    """
+    data = '\x00'.join(keys).encode('utf-8')
+    return int(hashlib.sha256(data).hexdigest(), 16)
+
+
+def content_hash(entries):
+    """
+    Accepts the entries of a snapshot and returns a hex digest of them, used
+    to check that a snapshot hasn't been modified or truncated.
+    """
+    data = json.dumps(entries, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class LazyClass(object):
+    """
+    A placeholder for a class loaded from a snapshot. It only stores the
+    dotted path, and the class is imported the first time it is needed.
+    """
+
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+    def resolve(self):
+        """
+        Import and return the class this placeholder points to.
+        """
+        return import_path(self.path)
+
+    def __repr__(self):
+        return '<LazyClass: %s>' % self.path
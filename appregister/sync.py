@@ -0,0 +1,99 @@
+"""
+Keep registries consistent between processes, such as gunicorn workers, by
+sharing a generation counter in a memory mapped file.
+"""
+
+import ctypes
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where writers are not locked.
+    fcntl = None
+
+
+class SharedGeneration(object):
+    """
+    A generation counter stored in a memory mapped file at ``path``, together
+    with a snapshot of the registry in ``path + '.json'``. Every process that
+    opens the same path sees the same counter, so reading it is enough to
+    find out if another process has changed the registry.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot_path = path + '.json'
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, 'r+b')
+        if os.fstat(fd).st_size < 8:
+            os.ftruncate(fd, 8)
+
+        self._map = mmap.mmap(fd, 8)
+        #: The shared counter. Read ``counter.value`` for the generation.
+        self.counter = ctypes.c_uint64.from_buffer(self._map)
+
+        self._thread_lock = threading.RLock()
+        # How many ``lock`` blocks are open in the thread holding the lock.
+        self._depth = 0
+
+    @contextmanager
+    def lock(self):
+        """
+        A context manager that holds an exclusive lock on the file, so that a
+        registry can load the latest snapshot, change it and publish it
+        without another process changing it in between. A file lock is held
+        by the whole process, so a thread lock is taken first to keep the
+        other threads of this process out as well. It can be nested, and the
+        file lock is released when the outermost block ends.
+        """
+        with self._thread_lock:
+            # Only the thread holding the thread lock gets here, so the depth
+            # counts the blocks that thread has open.
+            if fcntl is None or self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def publish(self, snapshot):
+        """
+        Accepts a registry snapshot, stores it and increments the counter.
+        Returns the new generation.
+        """
+        with self.lock():
+            generation = self.counter.value + 1
+            tmp = '%s.%s.tmp' % (self.snapshot_path, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump({'generation': generation, 'snapshot': snapshot}, f)
+            # Renaming is atomic, so readers never see a partial snapshot.
+            os.rename(tmp, self.snapshot_path)
+            self.counter.value = generation
+        return generation
+
+    def read(self):
+        """
+        Returns a tuple of the generation and snapshot that were last
+        published, or ``(0, None)`` if nothing has been published yet.
+        """
+        try:
+            with open(self.snapshot_path) as f:
+                data = json.load(f)
+        except (IOError, OSError):
+            return 0, None
+        return data['generation'], data['snapshot']
@@ -0,0 +1,72 @@
+"""
+Helpers for tests that change registries. Each test starts with the
+registries as they were, usually after autodiscovery, and the changes it
+makes are undone when it ends instead of the registries being rebuilt.
+"""
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def isolated(*registries):
+    """
+    A context manager that opens a ``checkpoint`` on each of ``registries``
+    and undoes any changes made to them when it ends::
+
+        with isolated(questions, answers):
+            questions.register(TestOnlyQuestion)
+    """
+    if not registries:
+        yield
+        return
+
+    with registries[0].checkpoint():
+        with isolated(*registries[1:]):
+            yield
+
+
+class IsolatedRegistriesMixin(object):
+    """
+    A mixin for ``TestCase`` classes that undoes the changes each test makes
+    to the registries listed in ``registries``::
+
+        class QuestionTestCase(IsolatedRegistriesMixin, TestCase):
+            registries = [questions]
+    """
+
+    #: The registries that are rolled back after each test.
+    registries = ()
+
+    def get_registries(self):
+        """
+        Returns the registries to roll back after each test. By default this
+        is ``registries``.
+        """
+        return self.registries
+
+    def setUp(self):
+        super(IsolatedRegistriesMixin, self).setUp()
+        manager = isolated(*self.get_registries())
+        manager.__enter__()
+        self.addCleanup(manager.__exit__, None, None, None)
+
+
+def registry_fixture(*registries):
+    """
+    Returns a pytest fixture that undoes the changes a test makes to
+    ``registries``. The fixture's value is the registry, or a tuple of the
+    registries if more than one is given::
+
+        questions_registry = registry_fixture(questions)
+
+        def test_register(questions_registry):
+            questions_registry.register(TestOnlyQuestion)
+    """
+    import pytest
+
+    @pytest.fixture
+    def fixture():
+        with isolated(*registries):
+            yield registries[0] if len(registries) == 1 else registries
+
+    return fixture
@@ -0,0 +1,106 @@
+"""
+Measure the memory that forked workers stop sharing with their parent after
+using the registries, with and without ``freeze_registries``. This reads
+``/proc`` so it only runs on Linux::
+
+    python benchmarks/bench_fork_memory.py --classes 20000 --workers 16
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def unique_rss():
+    """
+    Return the memory (in KiB) that is private to this process, which is the
+    memory it would give back if it exited.
+    """
+    total = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total
+
+
+def worker(registries, write):
+    # A typical worker reads every registry and the collector runs now and
+    # then, both of which write to the objects that were created before fork.
+    for registry in registries:
+        for _ in registry:
+            pass
+    gc.collect()
+    os.write(write, ('%s\n' % unique_rss()).encode('ascii'))
+    os._exit(0)
+
+
+def child(args):
+    from django.conf import settings
+    settings.configure(INSTALLED_APPS=[])
+
+    from appregister import Registry, NamedRegistry, freeze_registries
+
+    class Plugin(object):
+        pass
+
+    class PluginRegistry(Registry):
+        base = Plugin
+
+    class NamedPluginRegistry(NamedRegistry):
+        base = Plugin
+
+    plugins = PluginRegistry()
+    named = NamedPluginRegistry()
+    for i in range(args.classes):
+        class_ = type('Plugin%s' % i, (Plugin,), {'__slots__': ()})
+        plugins.register(class_)
+        named.register('plugin.%s' % i, class_)
+
+    if args.child == 'freeze':
+        freeze_registries()
+
+    read, write = os.pipe()
+    pids = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            worker([plugins, named], write)
+        pids.append(pid)
+
+    for pid in pids:
+        os.waitpid(pid, 0)
+    os.close(write)
+    with os.fdopen(read) as f:
+        sizes = [int(line) for line in f]
+
+    print(json.dumps(sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--classes', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--child')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    print("%s classes, %s workers" % (args.classes, args.workers))
+    for mode in ('default', 'freeze'):
+        command = [sys.executable, os.path.abspath(__file__), '--child', mode,
+            '--classes', str(args.classes), '--workers', str(args.workers)]
+        sizes = json.loads(subprocess.check_output(command, cwd=ROOT))
+        print("%-8s unique RSS per worker: mean %8.1f KiB  max %8.1f KiB" % (
+            mode, sum(sizes) / float(len(sizes)), max(sizes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure how long ``import appregister`` takes in a fresh interpreter, using
+``python -X importtime`` (Python 3.7 and later)::
+
+    python benchmarks/bench_import.py --runs 20
+
+The "own" column is the time spent in appregister's modules themselves. The
+total also includes the parts of Django and the standard library that they
+import, both when nothing else has been imported and when ``django.conf`` and
+``django.dispatch`` have already been imported, as they are in a project.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = (
+    ('cold', 'import appregister'),
+    ('django loaded', 'import django.conf, django.dispatch; '
+                      'import appregister'),
+)
+
+
+def measure(code, env):
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, stderr=subprocess.STDOUT).decode('utf-8')
+
+    own = total = 0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not own_us.strip().isdigit():
+            continue
+        name = name.strip()
+        if name.startswith('appregister'):
+            own += int(own_us)
+        if name == 'appregister':
+            total = int(cumulative_us)
+    return own / 1000.0, total / 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    # Bytecode is written by a first run, so that compiling the modules
+    # isn't counted.
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in env.get('PYTHONPATH', '').split(os.pathsep) if p])
+
+    print("%s runs of each" % args.runs)
+    for name, code in SCENARIOS:
+        measure(code, env)
+        results = [measure(code, env) for _ in range(args.runs)]
+        own = sorted(r[0] for r in results)
+        total = sorted(r[1] for r in results)
+        print("%-14s own min %6.2fms median %6.2fms  "
+              "total min %7.2fms median %7.2fms" % (
+                  name, own[0], own[len(own) // 2],
+                  total[0], total[len(total) // 2]))
+
+
+if __name__ == '__main__':
+    main()
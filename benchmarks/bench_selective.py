@@ -0,0 +1,75 @@
+"""
+Compare ``autodiscover`` scanning every installed app against only scanning
+the apps listed in ``discover_apps``. Each run happens in a fresh interpreter
+so that no imports are cached between them::
+
+    python benchmarks/bench_selective.py --apps 500 --plugins 5 --runs 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.utils import make_apps, remove_apps, configure  # noqa
+
+
+def child(args):
+    names = sorted((n for n in os.listdir(args.root)
+                    if n.startswith('benchapp')),
+                   key=lambda n: int(n[len('benchapp'):]))
+    configure(args.root, names)
+
+    from benchregistry import registry
+
+    if args.child == 'selective':
+        registry.discover_apps = names[:args.plugins]
+
+    start = time.time()
+    report = registry.autodiscover()
+    elapsed = time.time() - start
+
+    print(json.dumps({'elapsed': elapsed, 'members': len(registry),
+                      'checked': len(report.results)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--apps', type=int, default=500)
+    parser.add_argument('--plugins', type=int, default=5)
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--child')
+    parser.add_argument('--root')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    args.root, _ = make_apps(args.apps, args.plugins, args.classes)
+    try:
+        print("%s apps, %s with plugins, %s classes each, %s runs" % (
+            args.apps, args.plugins, args.classes, args.runs))
+
+        for mode in ('all', 'selective'):
+            command = [sys.executable, os.path.abspath(__file__),
+                '--child', mode, '--root', args.root,
+                '--plugins', str(args.plugins)]
+            results = [json.loads(subprocess.check_output(command, cwd=ROOT))
+                       for _ in range(args.runs)]
+            times = sorted(r['elapsed'] * 1000 for r in results)
+            print("%-10s min %8.2fms  median %8.2fms  checked %4s apps  "
+                  "members %s" % (mode, times[0], times[len(times) // 2],
+                                  results[0]['checked'],
+                                  results[0]['members']))
+    finally:
+        remove_apps(args.root)
+
+
+if __name__ == '__main__':
+    main()
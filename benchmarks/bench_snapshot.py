@@ -0,0 +1,84 @@
+"""
+Compare booting a registry with ``autodiscover`` against loading a snapshot
+taken by another process. Each run happens in a fresh interpreter so that no
+imports are cached between them::
+
+    python benchmarks/bench_snapshot.py --apps 200 --plugins 20 --runs 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.utils import make_apps, remove_apps, configure  # noqa
+
+
+def child(args):
+    names = sorted(n for n in os.listdir(args.root) if n.startswith('bench'))
+    names.remove('benchregistry.py')
+    configure(args.root, names)
+
+    from benchregistry import registry
+
+    start = time.time()
+    if args.child == 'snapshot':
+        with open(args.snapshot) as f:
+            registry.load_snapshot(json.load(f))
+        registry.resolve()
+    else:
+        registry.autodiscover()
+    elapsed = time.time() - start
+
+    if args.child == 'dump':
+        with open(args.snapshot, 'w') as f:
+            json.dump(registry.snapshot(), f)
+
+    print(json.dumps({'elapsed': elapsed, 'members': len(registry)}))
+
+
+def run(args, mode, snapshot):
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode,
+        '--root', args.root, '--snapshot', snapshot]
+    output = subprocess.check_output(command, cwd=ROOT)
+    return json.loads(output.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--apps', type=int, default=200)
+    parser.add_argument('--plugins', type=int, default=20)
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--child')
+    parser.add_argument('--root')
+    parser.add_argument('--snapshot')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    args.root, _ = make_apps(args.apps, args.plugins, args.classes)
+    snapshot = os.path.join(args.root, 'snapshot.json')
+    try:
+        run(args, 'dump', snapshot)
+        print("%s apps, %s with plugins, %s classes each, %s runs" % (
+            args.apps, args.plugins, args.classes, args.runs))
+
+        for mode in ('autodiscover', 'snapshot'):
+            results = [run(args, mode, snapshot) for _ in range(args.runs)]
+            times = sorted(r['elapsed'] * 1000 for r in results)
+            print("%-12s min %8.2fms  median %8.2fms  members %s" % (
+                mode, times[0], times[len(times) // 2],
+                results[0]['members']))
+    finally:
+        remove_apps(args.root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Shared helpers for the benchmark scripts. They generate a throwaway tree of
+Django apps so that autodiscovery has a realistic number of apps to scan.
+"""
+
+import os
+import shutil
+import tempfile
+
+REGISTRY_MODULE = '''
+from appregister import %(registry_class)s
+
+
+class Plugin(object):
+    pass
+
+
+class PluginRegistry(%(registry_class)s):
+    base = Plugin
+    discovermodule = 'plugins'
+
+registry = PluginRegistry()
+'''
+
+PLUGIN_CLASS = '''
+
+@registry.register
+class Plugin%(app)s_%(index)s(Plugin):
+    pass
+'''
+
+
+def make_apps(apps=200, plugins=20, classes=10, registry_class='Registry'):
+    """
+    Create a temporary directory containing ``apps`` packages, the first
+    ``plugins`` of which have a ``plugins`` module registering ``classes``
+    classes each into ``benchregistry.registry``. Returns the directory and
+    the list of app names; the caller should remove the directory.
+    """
+    root = tempfile.mkdtemp(prefix='appregister-bench-')
+
+    with open(os.path.join(root, 'benchregistry.py'), 'w') as f:
+        f.write(REGISTRY_MODULE % {'registry_class': registry_class})
+
+    names = []
+    for app in range(apps):
+        name = 'benchapp%s' % app
+        names.append(name)
+        os.mkdir(os.path.join(root, name))
+        open(os.path.join(root, name, '__init__.py'), 'w').close()
+
+        if app < plugins:
+            with open(os.path.join(root, name, 'plugins.py'), 'w') as f:
+                f.write('from benchregistry import Plugin, registry\n')
+                for index in range(classes):
+                    f.write(PLUGIN_CLASS % {'app': app, 'index': index})
+
+    return root, names
+
+
+def remove_apps(root):
+    shutil.rmtree(root, ignore_errors=True)
+
+
+def configure(root, names, **options):
+    """
+    Put the generated apps on the path and configure Django with them as the
+    ``INSTALLED_APPS``.
+    """
+    import sys
+    sys.path.insert(0, root)
+
+    from django.conf import settings
+    settings.configure(INSTALLED_APPS=names, **options)
+
+    import django
+    if hasattr(django, 'setup'):
+        django.setup()
@@ -12,11 +12,13 @@ def runtests(*test_args):
     sys.path.insert(0, parent + "/tests")
 
     sys.path.insert(0, parent)
-    from django.core.management import ManagementUtility
+    import django
+    from django.core.management import call_command
 
-    utility = ManagementUtility()
-    command = utility.fetch_command('test')
-    command.execute(verbosity=1)
+    if hasattr(django, 'setup'):
+        django.setup()
+
+    call_command('test', *(test_args or ('test_appregister',)), verbosity=1)
     sys.exit()
 
 
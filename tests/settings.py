@@ -6,6 +6,12 @@ sys.path.append("%s/.." % TEST_DIR)
 
 COMPRESS_CACHE_BACKEND = 'locmem://'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 DATABASES = {
     'default': {
@@ -27,4 +33,6 @@ MIDDLEWARE_CLASSES = (
 
 ROOT_URLCONF = 'test_appregister.urls'
 
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 SECRET_KEY = "test"
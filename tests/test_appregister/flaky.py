@@ -0,0 +1,14 @@
+# This file is used in the retry tests. It registers a class and then raises
+# while ``flaky_error`` is set on the registry, like a module that fails part
+# of the way through being imported.
+
+from test_appregister.models import flaky_registry
+
+
+@flaky_registry.register('flaky')
+class FlakyQuestion(object):
+    pass
+
+
+if flaky_registry.flaky_error:
+    raise flaky_registry.flaky_error
@@ -0,0 +1,4 @@
+# This file is used in the import budget tests. It imports a module that is
+# not imported anywhere else, so that it counts as a new module.
+
+from test_appregister import heavy_dependency  # noqa
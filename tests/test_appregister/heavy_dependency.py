@@ -0,0 +1 @@
+# Only imported by heavy.py, see the import budget tests.
@@ -1,5 +1,5 @@
 from django.db import models
-from appregister.base import Registry
+from appregister.base import Registry, NamedRegistry, SortedRegistry
 
 
 class Question(models.Model):
@@ -25,3 +25,16 @@ class QuestionRegistry(Registry):
 registry = QuestionRegistry()
 registry.register(BooleanQuestion)
 registry.register(MultipleChoiceQuestion)
+
+
+# Registries without instances, used by tests that need an importable class.
+
+
+class NamedQuestionRegistry(NamedRegistry):
+
+    base = Question
+
+
+class SortedQuestionRegistry(SortedRegistry):
+
+    base = Question
@@ -0,0 +1,17 @@
+# This file is run with pytest by the registry_fixture test. The first test
+# registers a class through the fixture, which should be gone again by the
+# time the second test runs.
+
+from appregister.testing import registry_fixture
+from test_appregister.models import fixture_registry, BooleanQuestion
+
+questions_registry = registry_fixture(fixture_registry)
+
+
+def test_register(questions_registry):
+    questions_registry.register('boolean', BooleanQuestion)
+    assert 'boolean' in questions_registry
+
+
+def test_rolled_back(questions_registry):
+    assert 'boolean' not in questions_registry
@@ -1,5 +1,5 @@
-from django.utils import unittest
 import sys
+import unittest
 
 
 class RegistryProcessTestCase(unittest.TestCase):
@@ -198,6 +198,219 @@ class NamedRegistryTestCase(unittest.TestCase):
         self.assertIn(MyTestSubClass, registry.values())
 
 
+class NamedRegistryPolicyTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        from appregister import NamedRegistry
+        from test_appregister.models import Question
+
+        class MyRegistry(NamedRegistry):
+            base = Question
+
+        class First(Question):
+            pass
+
+        class Second(Question):
+            pass
+
+        self.registry = MyRegistry()
+        self.First, self.Second = First, Second
+        self.registry.register('name', First)
+
+    def test_error_policy(self):
+
+        from appregister.base import AlreadyRegistered
+
+        with self.assertRaises(AlreadyRegistered):
+            self.registry.register('name', self.Second)
+
+        self.assertEqual(self.registry['name'], self.First)
+
+    def test_error_policy_over_snapshot_entry(self):
+        """
+        A class that can't be imported by a dotted path, registered over a
+        placeholder loaded from a snapshot, raises AlreadyRegistered.
+        """
+
+        from appregister.base import AlreadyRegistered
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion)
+
+        original = NamedQuestionRegistry()
+        original.register('name', BooleanQuestion)
+        registry = NamedQuestionRegistry()
+        registry.load_snapshot(original.snapshot())
+
+        with self.assertRaises(AlreadyRegistered):
+            registry.register('name', self.Second)
+
+    def test_decorator_already_registered(self):
+        """
+        The decorator form raises AlreadyRegistered rather than failing while
+        formatting the error message.
+        """
+
+        from appregister.base import AlreadyRegistered
+
+        decorator = self.registry.register('name')
+
+        with self.assertRaises(AlreadyRegistered):
+            decorator(self.Second)
+
+    def test_replace_policy(self):
+
+        from appregister.base import REPLACE
+
+        self.registry.register('name', self.Second, policy=REPLACE)
+        self.assertEqual(self.registry['name'], self.Second)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_ignore_policy(self):
+
+        from appregister.base import IGNORE
+
+        self.registry.register('name', self.Second, policy=IGNORE)
+        self.assertEqual(self.registry['name'], self.First)
+
+    def test_default_policy(self):
+
+        from appregister.base import REPLACE
+
+        self.registry.policy = REPLACE
+
+        @self.registry.register('name')
+        class Third(self.First):
+            pass
+
+        self.assertEqual(self.registry['name'], Third)
+
+    def test_unknown_policy(self):
+
+        with self.assertRaises(ValueError):
+            self.registry.register('other', self.Second, policy='sometimes')
+
+
+class DispatchRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        from appregister import DispatchRegistry
+
+        class Handler(object):
+            pass
+
+        class MyRegistry(DispatchRegistry):
+            base = Handler
+
+        self.Handler = Handler
+        self.registry = MyRegistry()
+
+    def test_dispatch_by_mro(self):
+
+        class IntHandler(self.Handler):
+            pass
+
+        class ObjectHandler(self.Handler):
+            pass
+
+        self.registry.register(int, IntHandler)
+        self.registry.register(object, ObjectHandler)
+
+        self.assertEqual(self.registry.dispatch(int), IntHandler)
+        self.assertEqual(self.registry.dispatch(bool), IntHandler)
+        self.assertEqual(self.registry.dispatch(str), ObjectHandler)
+        self.assertEqual(self.registry.handler_for(True), IntHandler)
+
+    def test_dispatch_without_handler(self):
+
+        class IntHandler(self.Handler):
+            pass
+
+        self.registry.register(int, IntHandler)
+
+        with self.assertRaises(KeyError):
+            self.registry.dispatch(str)
+
+    def test_cache_invalidated(self):
+
+        class IntHandler(self.Handler):
+            pass
+
+        @self.registry.register(bool)
+        class BoolHandler(self.Handler):
+            pass
+
+        self.registry.register(int, IntHandler)
+        self.assertEqual(self.registry.dispatch(bool), BoolHandler)
+        self.assertIn(bool, self.registry._cache)
+
+        self.registry.unregister(bool)
+        self.assertEqual(self.registry.dispatch(bool), IntHandler)
+
+        self.registry.clear()
+        with self.assertRaises(KeyError):
+            self.registry.dispatch(bool)
+
+    def test_dispatch_by_abstract_base_class(self):
+
+        import collections.abc
+
+        class SequenceHandler(self.Handler):
+            pass
+
+        class ObjectHandler(self.Handler):
+            pass
+
+        self.registry.register(object, ObjectHandler)
+        self.registry.register(collections.abc.Sequence, SequenceHandler)
+
+        self.assertEqual(self.registry.dispatch(list), SequenceHandler)
+        self.assertEqual(self.registry.dispatch(tuple), SequenceHandler)
+        self.assertEqual(self.registry.dispatch(dict), ObjectHandler)
+
+        # Registering a class with the ABC later changes its handler.
+        class Custom(object):
+            pass
+
+        self.assertEqual(self.registry.dispatch(Custom), ObjectHandler)
+        collections.abc.Sequence.register(Custom)
+        self.assertEqual(self.registry.dispatch(Custom), SequenceHandler)
+
+    def test_ambiguous_abstract_base_classes(self):
+
+        import collections.abc
+
+        class SizedHandler(self.Handler):
+            pass
+
+        class ContainerHandler(self.Handler):
+            pass
+
+        self.registry.register(collections.abc.Sized, SizedHandler)
+        self.registry.register(collections.abc.Container, ContainerHandler)
+
+        class Both(object):
+            def __len__(self):
+                return 0
+
+            def __contains__(self, item):
+                return False
+
+        with self.assertRaises(RuntimeError):
+            self.registry.dispatch(Both)
+
+    def test_register_non_type(self):
+
+        from appregister.base import InvalidOperation
+
+        class IntHandler(self.Handler):
+            pass
+
+        with self.assertRaises(InvalidOperation):
+            self.registry.register('int', IntHandler)
+
+
 class SortedRegistryTestCase(unittest.TestCase):
 
     def test_basic_registry(self):
@@ -253,6 +466,219 @@ class SortedRegistryTestCase(unittest.TestCase):
         self.assertIn(MyTestSubClass, registry.values())
 
 
+class DependencyRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        from appregister import DependencyRegistry
+
+        class Plugin(object):
+            pass
+
+        class MyRegistry(DependencyRegistry):
+            base = Plugin
+
+        self.Plugin = Plugin
+        self.registry = MyRegistry()
+
+    def test_dependency_order(self):
+
+        class First(self.Plugin):
+            pass
+
+        class Second(self.Plugin):
+            after = [First]
+
+        class Third(self.Plugin):
+            after = [Second, First]
+
+        self.registry.register(Third)
+        self.registry.register(Second)
+        self.registry.register(First)
+
+        self.assertEqual(list(self.registry), [First, Second, Third])
+
+    def test_dotted_path_dependencies(self):
+
+        class Base(self.Plugin):
+            pass
+
+        class Dependent(self.Plugin):
+            after = ['%s.%s' % (Base.__module__, Base.__qualname__)]
+
+        self.registry.register(Dependent)
+        self.registry.register(Base)
+
+        self.assertEqual(self.registry.all(), [Base, Dependent])
+
+    def test_unregistered_dependencies_ignored(self):
+
+        class Missing(self.Plugin):
+            pass
+
+        class A(self.Plugin):
+            after = [Missing]
+
+        class B(self.Plugin):
+            pass
+
+        self.registry.register(A)
+        self.registry.register(B)
+
+        self.assertEqual(self.registry.all(), [A, B])
+
+    def test_cycle_detected(self):
+
+        from appregister.base import CircularDependency
+
+        class A(self.Plugin):
+            pass
+
+        class B(self.Plugin):
+            after = [A]
+
+        class C(self.Plugin):
+            after = [B]
+
+        A.after = [C]
+
+        self.registry.register(B)
+        self.registry.register(C)
+
+        with self.assertRaises(CircularDependency):
+            self.registry.register(A)
+
+        self.assertFalse(self.registry.is_registered(A))
+        self.assertEqual(self.registry.all(), [B, C])
+
+    def test_classes_with_the_same_path(self):
+
+        def make_plugin():
+            class Generated(self.Plugin):
+                pass
+            return Generated
+
+        first = make_plugin()
+        second = make_plugin()
+
+        class Dependent(self.Plugin):
+            after = ['%s.%s' % (first.__module__, first.__qualname__)]
+
+        self.registry.register(Dependent)
+        self.registry.register(first)
+        self.registry.register(second)
+
+        self.assertEqual(len(self.registry), 3)
+        self.assertEqual(self.registry.all(), [first, second, Dependent])
+
+        self.registry.unregister(first)
+        self.assertEqual(self.registry.all(), [second, Dependent])
+        self.registry.unregister(second)
+        self.assertEqual(self.registry.all(), [Dependent])
+
+    def test_order_cached_until_changed(self):
+
+        class A(self.Plugin):
+            pass
+
+        class B(self.Plugin):
+            after = [A]
+
+        self.registry.register(B)
+        order = self.registry.all()
+        self.assertIs(self.registry.all(), order)
+
+        self.registry.register(A)
+        self.assertEqual(self.registry.all(), [A, B])
+
+        self.registry.unregister(A)
+        self.assertEqual(self.registry.all(), [B])
+
+
+class IndexedNamedRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        from appregister import IndexedNamedRegistry
+        from test_appregister.models import Question
+
+        class MyRegistry(IndexedNamedRegistry):
+            base = Question
+
+        self.registry = MyRegistry()
+
+        for name in ('import.csv', 'export', 'export.csv', 'export.json',
+                     'exporter', 'export.xml.pretty'):
+            self.registry.register(name, Question)
+
+    def test_startswith(self):
+
+        self.assertEqual(self.registry.startswith('export.'),
+            ['export.csv', 'export.json', 'export.xml.pretty'])
+        self.assertEqual(self.registry.startswith('imp'), ['import.csv'])
+        self.assertEqual(self.registry.startswith('missing'), [])
+
+    def test_name_must_be_string(self):
+
+        from appregister.base import InvalidOperation
+        from test_appregister.models import Question
+
+        with self.assertRaises(InvalidOperation):
+            self.registry.register(1, Question)
+        self.assertFalse(1 in self.registry)
+        self.assertEqual(len(self.registry.startswith('')), len(self.registry))
+
+    def test_range(self):
+
+        self.assertEqual(self.registry.range('export.d', 'exporter'),
+            ['export.json', 'export.xml.pretty'])
+        self.assertEqual(self.registry.range(stop='export.csv'), ['export'])
+        self.assertEqual(self.registry.range('import'), ['import.csv'])
+
+    def test_subtree(self):
+
+        self.assertEqual(self.registry.subtree('export'),
+            ['export', 'export.csv', 'export.json', 'export.xml.pretty'])
+        self.assertEqual(self.registry.subtree('export.xml'),
+            ['export.xml.pretty'])
+
+    def test_closest(self):
+
+        self.assertEqual(self.registry.closest('export.jsn', n=1),
+            ['export.json'])
+
+    def test_index_follows_replace(self):
+
+        from appregister.base import REPLACE
+
+        self.registry.register('export.yaml', self.registry['export'],
+            policy=REPLACE)
+        self.registry.register('export.csv', self.registry['export'],
+            policy=REPLACE)
+        self.assertEqual(self.registry.startswith('export.'),
+            ['export.csv', 'export.json', 'export.xml.pretty', 'export.yaml'])
+
+    def test_index_follows_unregister_before_query(self):
+
+        from test_appregister.models import Question
+
+        # The new names haven't been sorted into the index yet.
+        self.registry.register('export.b', Question)
+        self.registry.register('export.a', Question)
+        self.registry.unregister('export.b')
+        self.assertEqual(self.registry.startswith('export.'),
+            ['export.a', 'export.csv', 'export.json', 'export.xml.pretty'])
+
+    def test_index_follows_unregister_and_clear(self):
+
+        self.registry.unregister('export.json')
+        self.assertEqual(self.registry.startswith('export.'),
+            ['export.csv', 'export.xml.pretty'])
+
+        self.registry.clear()
+        self.assertEqual(self.registry.startswith(''), [])
+
+
 class RegistryDefinitionTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -315,49 +741,1036 @@ class RegistryDefinitionTestCase(unittest.TestCase):
             registry.register(MyObject)
 
 
-class AutodiscoverTestCase(unittest.TestCase):
+class SnapshotTestCase(unittest.TestCase):
 
-    def setUp(self):
-        """
-        Start with a clean registry for each test.
-        """
+    def test_registry_snapshot(self):
 
-        from test_appregister import models
-        models.registry = models.QuestionRegistry()
+        import json
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
 
-    def test_autodiscover(self):
-        """
-        Test a basic autodiscover to find all the registered items in each
-        Django app
-        """
+        registry = QuestionRegistry()
+        registry.register(BooleanQuestion)
+        registry.register(MultipleChoiceQuestion)
 
-        from test_appregister.models import registry
+        snapshot = json.loads(json.dumps(registry.snapshot()))
+        self.assertEqual(snapshot['entries'], [
+            'test_appregister.models.BooleanQuestion',
+            'test_appregister.models.MultipleChoiceQuestion',
+        ])
 
-        registry.autodiscover()
+        loaded = QuestionRegistry()
+        loaded.load_snapshot(snapshot)
 
-        names = [(c.__module__, c.__name__) for c in registry.all()]
-        self.assertIn(('test_appregister.questions', 'MyAutoDiscoveredQuestion'), names)
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.all(),
+            set([BooleanQuestion, MultipleChoiceQuestion]))
 
-    def test_autodiscover_overwrite(self):
-        """
-        Test autodiscover with an overwrite of the module name
-        """
+    def test_named_snapshot_is_lazy(self):
 
-        from test_appregister.models import registry
+        from appregister.snapshot import LazyClass
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion)
 
-        registry.autodiscover('questions2')
+        registry = NamedQuestionRegistry()
+        registry.register('bool', BooleanQuestion)
 
-        names = [(c.__module__, c.__name__) for c in registry.all()]
-        self.assertIn(('test_appregister.questions2', 'MyAutoDiscoveredQuestion2'), names)
+        loaded = NamedQuestionRegistry()
+        loaded.load_snapshot(registry.snapshot())
 
-    def test_autodiscover_import_error(self):
-        """
-        Test autodiscover with a module that raises an import error. This is to
-        test that the ImportError isn't masked by being misinterpreted as the
-        question_error module not existing.
-        """
+        self.assertIn('bool', loaded)
+        self.assertIsInstance(loaded._registry['bool'], LazyClass)
 
-        from test_appregister.models import registry
+        self.assertEqual(loaded['bool'], BooleanQuestion)
+        self.assertEqual(loaded._registry['bool'], BooleanQuestion)
+
+    def test_named_placeholder_filled_by_register(self):
+
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion)
+
+        registry = NamedQuestionRegistry()
+        registry.register('bool', BooleanQuestion)
+
+        loaded = NamedQuestionRegistry()
+        loaded.load_snapshot(registry.snapshot())
+        loaded.register('bool', BooleanQuestion)
+
+        self.assertEqual(loaded.all(), {'bool': BooleanQuestion})
+
+    def test_sorted_snapshot_keeps_order(self):
+
+        from test_appregister.models import (SortedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = SortedQuestionRegistry()
+        registry.register(MultipleChoiceQuestion)
+        registry.register(BooleanQuestion)
+
+        loaded = SortedQuestionRegistry()
+        loaded.load_snapshot(registry.snapshot(with_hash=False))
+
+        self.assertEqual(loaded.all(),
+            [MultipleChoiceQuestion, BooleanQuestion])
+
+    def test_failed_import_stays_pending(self):
+
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion)
+
+        registry = QuestionRegistry()
+        registry.register(BooleanQuestion)
+        snapshot = registry.snapshot(with_hash=False)
+        snapshot['entries'].insert(0, 'appregister_missing.Missing')
+
+        loaded = QuestionRegistry()
+        loaded.load_snapshot(snapshot)
+        fingerprint = loaded.fingerprint()
 
         with self.assertRaises(ImportError):
-            registry.autodiscover('questions_error')
+            len(loaded)
+        with self.assertRaises(ImportError):
+            len(loaded)
+        self.assertEqual(loaded.fingerprint(), fingerprint)
+
+    def test_sorted_order_after_failed_import(self):
+
+        import sys
+        import types
+        from test_appregister.models import (SortedQuestionRegistry,
+            Question, BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = SortedQuestionRegistry()
+        registry.register(BooleanQuestion)
+        registry.register(MultipleChoiceQuestion)
+        snapshot = registry.snapshot(with_hash=False)
+        snapshot['entries'].insert(1, 'appregister_missing.Missing')
+
+        loaded = SortedQuestionRegistry()
+        loaded.load_snapshot(snapshot)
+        with self.assertRaises(ImportError):
+            loaded.all()
+
+        # Once the module can be imported, the remaining entries are
+        # imported and the order from the snapshot is kept.
+        module = types.ModuleType('appregister_missing')
+        module.Missing = Question
+        sys.modules['appregister_missing'] = module
+        try:
+            self.assertEqual(loaded.all(),
+                [BooleanQuestion, MultipleChoiceQuestion, Question])
+        finally:
+            del sys.modules['appregister_missing']
+
+    def test_invalid_snapshot(self):
+
+        from appregister.base import InvalidSnapshot
+        from test_appregister.models import (QuestionRegistry,
+            SortedQuestionRegistry, BooleanQuestion)
+
+        registry = QuestionRegistry()
+        registry.register(BooleanQuestion)
+        snapshot = registry.snapshot()
+
+        with self.assertRaises(InvalidSnapshot):
+            SortedQuestionRegistry().load_snapshot(snapshot)
+
+        snapshot['entries'].append('test_appregister.models.Question')
+
+        with self.assertRaises(InvalidSnapshot):
+            QuestionRegistry().load_snapshot(snapshot)
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_registry_fingerprint_ignores_order(self):
+
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        first, second = QuestionRegistry(), QuestionRegistry()
+        empty = first.fingerprint()
+        self.assertEqual(len(empty), 64)
+
+        first.register(BooleanQuestion)
+        first.register(MultipleChoiceQuestion)
+        second.register(MultipleChoiceQuestion)
+        second.register(BooleanQuestion)
+        self.assertEqual(first.fingerprint(), second.fingerprint())
+        self.assertNotEqual(first.fingerprint(), empty)
+
+        first.unregister(BooleanQuestion)
+        self.assertNotEqual(first.fingerprint(), second.fingerprint())
+        first.unregister(MultipleChoiceQuestion)
+        self.assertEqual(first.fingerprint(), empty)
+
+    def test_sorted_fingerprint_depends_on_order(self):
+
+        from test_appregister.models import (SortedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        first, second = SortedQuestionRegistry(), SortedQuestionRegistry()
+        first.register(BooleanQuestion)
+        first.register(MultipleChoiceQuestion)
+        second.register(MultipleChoiceQuestion)
+        second.register(BooleanQuestion)
+        self.assertNotEqual(first.fingerprint(), second.fingerprint())
+
+        second.unregister(MultipleChoiceQuestion)
+        second.register(MultipleChoiceQuestion)
+        self.assertEqual(first.fingerprint(), second.fingerprint())
+
+    def test_named_fingerprint(self):
+
+        from appregister.base import REPLACE
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        first, second = NamedQuestionRegistry(), NamedQuestionRegistry()
+        first.register('question', BooleanQuestion)
+        second.register('question', MultipleChoiceQuestion)
+        self.assertNotEqual(first.fingerprint(), second.fingerprint())
+
+        second.register('question', BooleanQuestion, policy=REPLACE)
+        self.assertEqual(first.fingerprint(), second.fingerprint())
+
+    def test_fingerprint_matches_after_snapshot(self):
+
+        from test_appregister.models import (NamedQuestionRegistry,
+            SortedQuestionRegistry, BooleanQuestion, MultipleChoiceQuestion)
+
+        named = NamedQuestionRegistry()
+        named.register('bool', BooleanQuestion)
+        loaded = NamedQuestionRegistry()
+        loaded.load_snapshot(named.snapshot())
+        self.assertEqual(loaded.fingerprint(), named.fingerprint())
+
+        ordered = SortedQuestionRegistry()
+        ordered.register(MultipleChoiceQuestion)
+        ordered.register(BooleanQuestion)
+        loaded = SortedQuestionRegistry()
+        loaded.load_snapshot(ordered.snapshot())
+        self.assertEqual(loaded.fingerprint(), ordered.fingerprint())
+        loaded.resolve()
+        self.assertEqual(loaded.fingerprint(), ordered.fingerprint())
+
+    def test_diff(self):
+
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion, Question)
+
+        local, remote = QuestionRegistry(), QuestionRegistry()
+        local.register(BooleanQuestion)
+        remote.register(BooleanQuestion)
+        self.assertEqual(local.diff(remote.snapshot()),
+            {'added': [], 'removed': [], 'reordered': False})
+
+        local.register(MultipleChoiceQuestion)
+        remote.register(Question)
+        self.assertEqual(local.diff(remote.snapshot()), {
+            'added': ['test_appregister.models.MultipleChoiceQuestion'],
+            'removed': ['test_appregister.models.Question'],
+            'reordered': False,
+        })
+
+    def test_sorted_diff_reordered(self):
+
+        from test_appregister.models import (SortedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        local, remote = SortedQuestionRegistry(), SortedQuestionRegistry()
+        local.register(BooleanQuestion)
+        local.register(MultipleChoiceQuestion)
+        remote.register(MultipleChoiceQuestion)
+        remote.register(BooleanQuestion)
+
+        self.assertEqual(local.diff(remote.snapshot()),
+            {'added': [], 'removed': [], 'reordered': True})
+
+
+class FreezeTestCase(unittest.TestCase):
+
+    def test_freeze_registry(self):
+
+        from appregister.base import InvalidOperation
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = QuestionRegistry()
+        registry.register(BooleanQuestion)
+        registry.freeze()
+
+        self.assertTrue(registry.frozen)
+        self.assertEqual(registry.all(), frozenset([BooleanQuestion]))
+        self.assertTrue(registry.is_registered(BooleanQuestion))
+
+        with self.assertRaises(InvalidOperation):
+            registry.register(MultipleChoiceQuestion)
+        with self.assertRaises(InvalidOperation):
+            registry.unregister(BooleanQuestion)
+        with self.assertRaises(InvalidOperation):
+            registry.clear()
+
+        registry.thaw()
+        registry.register(MultipleChoiceQuestion)
+        self.assertEqual(len(registry), 2)
+
+    def test_freeze_sorted_registry(self):
+
+        from test_appregister.models import (SortedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = SortedQuestionRegistry()
+        registry.register(MultipleChoiceQuestion)
+        registry.register(BooleanQuestion)
+        registry.freeze()
+
+        self.assertEqual(registry.all(),
+            (MultipleChoiceQuestion, BooleanQuestion))
+
+        registry.thaw()
+        registry.unregister(MultipleChoiceQuestion)
+        self.assertEqual(registry.all(), [BooleanQuestion])
+
+    def test_freeze_named_registry(self):
+
+        from appregister.base import InvalidOperation
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion)
+
+        registry = NamedQuestionRegistry()
+        registry.register('bool', BooleanQuestion)
+        registry.freeze()
+
+        self.assertEqual(registry['bool'], BooleanQuestion)
+
+        with self.assertRaises(InvalidOperation):
+            registry.register('other', BooleanQuestion)
+        with self.assertRaises(InvalidOperation):
+            registry.unregister('bool')
+
+    def test_freeze_registries(self):
+
+        from appregister import freeze_registries
+        from appregister.base import BaseRegistry
+        from test_appregister.models import QuestionRegistry
+
+        registry = QuestionRegistry()
+        thawed = [r for r in BaseRegistry._instances.values() if not r.frozen]
+
+        try:
+            freeze_registries(collect=False)
+            self.assertTrue(registry.frozen)
+        finally:
+            for r in thawed:
+                r.thaw()
+
+
+class ChangeSignalTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        from appregister.signals import registry_changed
+        from test_appregister.models import QuestionRegistry
+
+        self.registry = QuestionRegistry()
+        self.received = []
+        registry_changed.connect(self.receiver)
+
+    def tearDown(self):
+
+        from appregister.signals import registry_changed
+        registry_changed.disconnect(self.receiver)
+
+    def receiver(self, sender, registry, version, **kwargs):
+        if registry is self.registry:
+            self.received.append(version)
+
+    def test_signal_per_change(self):
+
+        from test_appregister.models import (BooleanQuestion,
+            MultipleChoiceQuestion)
+
+        self.registry.register(BooleanQuestion)
+        self.registry.register(MultipleChoiceQuestion)
+        self.registry.unregister(BooleanQuestion)
+        self.registry.clear()
+
+        self.assertEqual(self.received, [1, 2, 3, 4])
+        self.assertEqual(self.registry.version, 4)
+
+    def test_batch_coalesces(self):
+
+        from test_appregister.models import (BooleanQuestion,
+            MultipleChoiceQuestion)
+
+        with self.registry.batch():
+            self.registry.register(BooleanQuestion)
+            with self.registry.batch():
+                self.registry.register(MultipleChoiceQuestion)
+            self.assertEqual(self.received, [])
+
+        self.assertEqual(self.received, [2])
+
+    def test_empty_batch(self):
+
+        with self.registry.batch():
+            pass
+
+        self.assertEqual(self.received, [])
+
+    def test_autodiscover_sends_one_signal(self):
+
+        self.registry.autodiscover('questions_missing')
+        self.assertEqual(self.received, [])
+
+        from test_appregister.models import (BooleanQuestion,
+            MultipleChoiceQuestion)
+
+        # Simulate discover modules registering several classes.
+        def discover_app(app, module):
+            if not self.registry.is_registered(BooleanQuestion):
+                self.registry.register(BooleanQuestion)
+                self.registry.register(MultipleChoiceQuestion)
+            return True
+
+        self.registry.discover_app = discover_app
+        self.registry.autodiscover()
+
+        self.assertEqual(self.received, [2])
+
+    def test_ignored_registration_is_not_a_change(self):
+
+        from appregister.base import IGNORE
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion)
+
+        registry = NamedQuestionRegistry()
+        registry.register('bool', BooleanQuestion)
+        registry.register('bool', BooleanQuestion, policy=IGNORE)
+
+        self.assertEqual(registry.version, 1)
+
+
+class RegistryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        from django.core.cache import cache
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion)
+
+        cache.clear()
+        self.registry = QuestionRegistry()
+        self.registry.register(BooleanQuestion)
+        self.calls = []
+
+    def test_cached_until_registry_changes(self):
+
+        from appregister.cache import cached
+        from test_appregister.models import MultipleChoiceQuestion
+
+        @cached(self.registry)
+        def names(suffix):
+            self.calls.append(suffix)
+            return sorted(c.__name__ + suffix for c in self.registry)
+
+        self.assertEqual(names('!'), ['BooleanQuestion!'])
+        self.assertEqual(names('!'), ['BooleanQuestion!'])
+        self.assertEqual(names('?'), ['BooleanQuestion?'])
+        self.assertEqual(self.calls, ['!', '?'])
+
+        self.registry.register(MultipleChoiceQuestion)
+        self.assertEqual(names('!'),
+            ['BooleanQuestion!', 'MultipleChoiceQuestion!'])
+        self.assertEqual(self.calls, ['!', '?', '!'])
+
+    def test_shared_between_registries_with_same_contents(self):
+        """
+        Another process with the same classes registered gets the same
+        fingerprint, and so reuses the cached result.
+        """
+
+        from appregister.cache import cached
+        from test_appregister.models import QuestionRegistry, BooleanQuestion
+
+        other = QuestionRegistry()
+        other.register(BooleanQuestion)
+        self.assertEqual(other.fingerprint(), self.registry.fingerprint())
+
+        def compute():
+            self.calls.append(1)
+            return None
+
+        first = cached(self.registry)(compute)
+        second = cached(other)(compute)
+
+        self.assertIsNone(first())
+        self.assertIsNone(second())
+        self.assertEqual(self.calls, [1])
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def test_registry_rollback(self):
+
+        from test_appregister.models import (QuestionRegistry, Question,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        class TextQuestion(Question):
+            pass
+
+        registry = QuestionRegistry()
+        registry.register(BooleanQuestion)
+        registry.register(MultipleChoiceQuestion)
+        fingerprint = registry.fingerprint()
+
+        with registry.checkpoint():
+            registry.register(TextQuestion)
+            registry.unregister(BooleanQuestion)
+            self.assertEqual(registry.all(),
+                set([MultipleChoiceQuestion, TextQuestion]))
+
+        self.assertEqual(registry.all(),
+            set([BooleanQuestion, MultipleChoiceQuestion]))
+        self.assertEqual(registry.fingerprint(), fingerprint)
+        self.assertEqual(registry._undo, None)
+
+        # Changes made after the checkpoint has ended are kept.
+        registry.register(TextQuestion)
+        self.assertTrue(registry.is_registered(TextQuestion))
+
+    def test_clear_rollback(self):
+
+        from test_appregister.models import (SortedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = SortedQuestionRegistry()
+        registry.register(MultipleChoiceQuestion)
+        registry.register(BooleanQuestion)
+        fingerprint = registry.fingerprint()
+
+        with registry.checkpoint():
+            registry.clear()
+            registry.register(BooleanQuestion)
+
+        self.assertEqual(registry.all(),
+            [MultipleChoiceQuestion, BooleanQuestion])
+        self.assertEqual(registry.fingerprint(), fingerprint)
+
+    def test_sorted_position(self):
+
+        from test_appregister.models import (SortedQuestionRegistry,
+            Question, BooleanQuestion, MultipleChoiceQuestion)
+
+        class TextQuestion(Question):
+            pass
+
+        registry = SortedQuestionRegistry()
+        registry.register(BooleanQuestion)
+        registry.register(TextQuestion)
+        registry.register(MultipleChoiceQuestion)
+        fingerprint = registry.fingerprint()
+
+        with registry.checkpoint():
+            registry.unregister(TextQuestion)
+            registry.unregister(BooleanQuestion)
+
+        self.assertEqual(registry.all(),
+            [BooleanQuestion, TextQuestion, MultipleChoiceQuestion])
+        self.assertEqual(registry.fingerprint(), fingerprint)
+
+    def test_named_rollback(self):
+
+        from appregister.base import REPLACE
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = NamedQuestionRegistry()
+        registry.register('boolean', BooleanQuestion)
+        registry.register('multiple', MultipleChoiceQuestion)
+        fingerprint = registry.fingerprint()
+
+        with registry.checkpoint():
+            registry.register('boolean', MultipleChoiceQuestion,
+                policy=REPLACE)
+            registry.unregister('multiple')
+            registry.register('other', BooleanQuestion)
+            registry.clear()
+            registry.register('new', BooleanQuestion)
+
+        self.assertEqual(dict(registry.items()), {
+            'boolean': BooleanQuestion,
+            'multiple': MultipleChoiceQuestion,
+        })
+        self.assertEqual(registry.fingerprint(), fingerprint)
+
+    def test_nested(self):
+
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = QuestionRegistry()
+
+        with registry.checkpoint():
+            registry.register(BooleanQuestion)
+            with registry.checkpoint():
+                registry.register(MultipleChoiceQuestion)
+            self.assertEqual(registry.all(), set([BooleanQuestion]))
+            registry.register(MultipleChoiceQuestion)
+
+        self.assertEqual(registry.all(), set())
+
+    def test_single_notification(self):
+
+        from appregister.signals import registry_changed
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = QuestionRegistry()
+        with registry.checkpoint():
+            registry.register(BooleanQuestion)
+            registry.register(MultipleChoiceQuestion)
+
+            received = []
+
+            def receiver(sender, registry, version, **kwargs):
+                received.append(version)
+
+            registry_changed.connect(receiver)
+
+        registry_changed.disconnect(receiver)
+        self.assertEqual(received, [registry.version])
+
+    def test_isolated(self):
+
+        from appregister.testing import isolated
+        from test_appregister.models import (QuestionRegistry,
+            NamedQuestionRegistry, BooleanQuestion)
+
+        registry, named = QuestionRegistry(), NamedQuestionRegistry()
+
+        with isolated(registry, named):
+            registry.register(BooleanQuestion)
+            named.register('boolean', BooleanQuestion)
+
+        self.assertEqual(len(registry), 0)
+        self.assertEqual(len(named), 0)
+
+    def test_mixin(self):
+
+        from appregister.testing import IsolatedRegistriesMixin
+        from test_appregister.models import QuestionRegistry, BooleanQuestion
+
+        registry = QuestionRegistry()
+
+        class IsolatedTestCase(IsolatedRegistriesMixin, unittest.TestCase):
+
+            registries = [registry]
+
+            def test_register(self):
+                registry.register(BooleanQuestion)
+
+        result = unittest.TestResult()
+        IsolatedTestCase('test_register').run(result)
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(len(registry), 0)
+
+    def test_fixture(self):
+
+        try:
+            import pytest
+        except ImportError:
+            self.skipTest("pytest is not installed")
+
+        import os
+        from test_appregister import models
+
+        path = os.path.join(os.path.dirname(models.__file__),
+            'pytest_fixture.py')
+        models.fixture_registry = registry = models.NamedQuestionRegistry()
+        try:
+            code = pytest.main(['-q', '-p', 'no:cacheprovider', path])
+        finally:
+            del models.fixture_registry
+            sys.modules.pop('test_appregister.pytest_fixture', None)
+
+        self.assertEqual(code, 0)
+        self.assertEqual(len(registry), 0)
+
+
+def _register_in_process(path, name):
+    """
+    Used by SharedGenerationTestCase to change a shared registry in another
+    process.
+    """
+    from test_appregister import models
+
+    registry = models.NamedQuestionRegistry()
+    registry.share(path)
+    registry.register(name, models.MultipleChoiceQuestion)
+
+
+class SharedGenerationTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        import tempfile
+        self.tmp = tempfile.mkdtemp()
+        self.path = self.tmp + '/registry'
+
+    def tearDown(self):
+
+        import shutil
+        shutil.rmtree(self.tmp)
+
+    def test_unshared_registry(self):
+
+        from test_appregister.models import NamedQuestionRegistry
+
+        registry = NamedQuestionRegistry()
+        self.assertIsNone(registry._shared)
+
+    def test_unshared_import(self):
+
+        import subprocess
+        code = ('import sys, appregister; '
+                'sys.exit("appregister.sync" in sys.modules)')
+        self.assertEqual(subprocess.call([sys.executable, '-c', code]), 0)
+
+    def test_first_share_publishes(self):
+
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion)
+
+        first = NamedQuestionRegistry()
+        first.register('bool', BooleanQuestion)
+        first.share(self.path)
+
+        second = NamedQuestionRegistry()
+        second.share(self.path)
+
+        self.assertEqual(second['bool'], BooleanQuestion)
+
+    def test_change_in_other_process(self):
+
+        import multiprocessing
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = NamedQuestionRegistry()
+        registry.register('bool', BooleanQuestion)
+        registry.share(self.path)
+        generation = registry._generation
+
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=_register_in_process,
+            args=(self.path, 'multiple'))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+        self.assertNotEqual(registry._counter.value, generation)
+        self.assertEqual(registry['multiple'], MultipleChoiceQuestion)
+        self.assertEqual(registry._generation, registry._counter.value)
+        self.assertEqual(len(registry), 2)
+
+    def test_changes_from_two_registries(self):
+
+        from test_appregister.models import (NamedQuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        first, second = NamedQuestionRegistry(), NamedQuestionRegistry()
+        first.register('bool', BooleanQuestion)
+        first.share(self.path)
+        second.share(self.path)
+
+        # Each change is made to the contents last published by the other.
+        first.register('multi', MultipleChoiceQuestion)
+        second.unregister('bool')
+
+        self.assertEqual(list(first), ['multi'])
+        self.assertEqual(list(second), ['multi'])
+        self.assertEqual(first.fingerprint(), second.fingerprint())
+        self.assertEqual(second._generation, second._counter.value)
+
+    def test_lock_excludes_other_threads(self):
+
+        import threading
+        import time
+        from appregister.sync import SharedGeneration
+
+        shared = SharedGeneration(self.path)
+        inside, most = [0], [0]
+
+        def worker():
+            for _ in range(5):
+                with shared.lock():
+                    with shared.lock():
+                        inside[0] += 1
+                        most[0] = max(most[0], inside[0])
+                        time.sleep(0.001)
+                        inside[0] -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(most[0], 1)
+
+    def test_class_without_dotted_path(self):
+
+        from appregister.base import InvalidOperation
+        from test_appregister.models import (QuestionRegistry, Question,
+            BooleanQuestion)
+
+        class LocalQuestion(Question):
+            pass
+
+        registry = QuestionRegistry()
+        registry.share(self.path)
+        version = registry.version
+
+        with self.assertRaises(InvalidOperation):
+            registry.register(LocalQuestion)
+        self.assertFalse(registry.is_registered(LocalQuestion))
+        self.assertEqual(registry.version, version)
+
+        registry.register(BooleanQuestion)
+        self.assertEqual(registry.all(), set([BooleanQuestion]))
+
+    def test_unregister_in_forked_process(self):
+
+        import multiprocessing
+        from test_appregister.models import (QuestionRegistry,
+            BooleanQuestion, MultipleChoiceQuestion)
+
+        registry = QuestionRegistry()
+        registry.register(BooleanQuestion)
+        registry.register(MultipleChoiceQuestion)
+        registry.share(self.path)
+
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=registry.unregister,
+            args=(BooleanQuestion,))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+        self.assertFalse(registry.is_registered(BooleanQuestion))
+        self.assertEqual(registry.all(), set([MultipleChoiceQuestion]))
+
+
+class AutodiscoverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Start with a clean registry for each test.
+        """
+
+        from test_appregister import models
+        models.registry = models.QuestionRegistry()
+
+    def test_autodiscover(self):
+        """
+        Test a basic autodiscover to find all the registered items in each
+        Django app
+        """
+
+        from test_appregister.models import registry
+
+        registry.autodiscover()
+
+        names = [(c.__module__, c.__name__) for c in registry.all()]
+        self.assertIn(('test_appregister.questions', 'MyAutoDiscoveredQuestion'), names)
+
+    def test_autodiscover_overwrite(self):
+        """
+        Test autodiscover with an overwrite of the module name
+        """
+
+        from test_appregister.models import registry
+
+        registry.autodiscover('questions2')
+
+        names = [(c.__module__, c.__name__) for c in registry.all()]
+        self.assertIn(('test_appregister.questions2', 'MyAutoDiscoveredQuestion2'), names)
+
+    def test_autodiscover_import_error(self):
+        """
+        Test autodiscover with a module that raises an import error. This is to
+        test that the ImportError isn't masked by being misinterpreted as the
+        question_error module not existing.
+        """
+
+        from test_appregister.models import registry
+
+        with self.assertRaises(ImportError):
+            registry.autodiscover('questions_error')
+
+    def test_report(self):
+        """
+        Test the report returned by autodiscover lists the apps that have the
+        module.
+        """
+
+        from test_appregister.models import registry
+
+        report = registry.autodiscover()
+
+        self.assertEqual(report.discovered, ['test_appregister'])
+        self.assertEqual(report.failed, {})
+        self.assertEqual([r.app for r in report.results],
+            ['appregister', 'test_appregister'])
+
+    def test_report_collects_errors(self):
+        """
+        Test autodiscover keeps going past a failing app and records the error
+        when fail_fast is False, and that retry only checks the failed apps.
+        """
+
+        from test_appregister.models import registry
+
+        report = registry.autodiscover('questions_error', fail_fast=False)
+
+        self.assertEqual(list(report.failed), ['test_appregister'])
+        self.assertIsInstance(report.failed['test_appregister'], ImportError)
+        self.assertIn('fake_module_name', report.results[1].traceback)
+        self.assertEqual(report.discovered, [])
+
+        retry = report.retry()
+        self.assertEqual([r.app for r in retry.results], ['test_appregister'])
+        self.assertEqual(list(retry.failed), ['test_appregister'])
+
+    def test_retry_after_partial_import(self):
+        """
+        Test the classes registered by a module that then raised are removed,
+        so that retry can import the module again once the cause is fixed.
+        """
+
+        from appregister import NamedRegistry
+        from test_appregister import models
+
+        class FlakyRegistry(NamedRegistry):
+            base = object
+            flaky_error = ValueError('Not ready yet')
+
+        models.flaky_registry = registry = FlakyRegistry()
+        try:
+            report = registry.autodiscover('flaky', fail_fast=False,
+                apps=['test_appregister'])
+            self.assertEqual(list(report.failed), ['test_appregister'])
+            self.assertEqual(len(registry), 0)
+
+            registry.flaky_error = None
+            retry = report.retry()
+            self.assertEqual(retry.failed, {})
+            self.assertEqual(retry.discovered, ['test_appregister'])
+            self.assertEqual(registry['flaky'].__module__,
+                'test_appregister.flaky')
+        finally:
+            del models.flaky_registry
+            sys.modules.pop('test_appregister.flaky', None)
+
+    def test_discover_apps(self):
+        """
+        Test autodiscover only checks the apps allowed by the registry.
+        """
+
+        from test_appregister.models import registry
+
+        registry.discover_apps = ['test_*']
+        report = registry.autodiscover()
+        self.assertEqual([r.app for r in report.results], ['test_appregister'])
+
+        registry.exclude_apps = ['test_appregister']
+        report = registry.autodiscover()
+        self.assertEqual(report.results, [])
+
+    def test_discover_apps_setting(self):
+        """
+        Test the APPREGISTER_DISCOVER_APPS setting takes precedence over the
+        registry's own list of apps.
+        """
+
+        from django.conf import settings
+        from test_appregister.models import registry
+
+        registry.discover_apps = ['test_appregister']
+        settings.APPREGISTER_DISCOVER_APPS = {'questions': ['appregister']}
+        try:
+            report = registry.autodiscover()
+            self.assertEqual([r.app for r in report.results], ['appregister'])
+
+            report = registry.autodiscover('questions2')
+            self.assertEqual([r.app for r in report.results],
+                ['test_appregister'])
+        finally:
+            del settings.APPREGISTER_DISCOVER_APPS
+
+    def test_import_module_budget(self):
+        """
+        Test autodiscover records the modules imported for each app and
+        raises when an app imports more new modules than allowed.
+        """
+
+        from appregister.base import ImportBudgetExceeded
+        from test_appregister.models import registry
+
+        registry.import_module_budget = 1
+        registry.budget_action = 'raise'
+
+        report = registry.autodiscover('heavy', fail_fast=False)
+
+        result = report.results[1]
+        self.assertEqual(result.app, 'test_appregister')
+        self.assertTrue(result.found)
+        self.assertEqual(result.modules, ['test_appregister.heavy',
+            'test_appregister.heavy_dependency'])
+        self.assertIsInstance(result.error, ImportBudgetExceeded)
+        self.assertIn('imported 2 new modules (budget 1)', str(result.error))
+        self.assertIn('test_appregister (2: test_appregister.heavy, '
+            'test_appregister.heavy_dependency)', str(result.error))
+
+    def test_import_budget_message(self):
+        """
+        Test the budget message names the modules from the largest packages
+        and trims the rest.
+        """
+
+        from appregister.base import ImportBudgetExceeded
+        from test_appregister.models import registry
+
+        registry.import_module_budget = 0
+        registry.budget_action = 'raise'
+        modules = ['big.%s' % i for i in range(7)] + ['small', 'other.a']
+
+        with self.assertRaises(ImportBudgetExceeded) as context:
+            registry.check_import_budget('app', 'questions', 0, modules)
+
+        message = str(context.exception)
+        self.assertIn('big (7: big.0, big.1, big.2, big.3, big.4 and 2 more)',
+            message)
+        self.assertIn('; other (1: other.a); small (1: small)', message)
+
+    def test_import_time_budget(self):
+        """
+        Test autodiscover warns when an app takes longer than allowed.
+        """
+
+        import warnings
+        from appregister.base import ImportBudgetWarning
+        from test_appregister.models import registry
+
+        registry.import_time_budget = 0
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            report = registry.autodiscover('questions')
+
+        self.assertEqual(report.failed, {})
+        self.assertTrue(caught)
+        self.assertTrue(all(issubclass(w.category, ImportBudgetWarning)
+                            for w in caught))